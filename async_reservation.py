@@ -0,0 +1,129 @@
+""" Non-interactive asyncio reservation API for serving many booking sessions from one event loop """
+
+import asyncio
+
+from flight_reservation_system import FlightReservationSystem
+from flight_search import FlightCatalog
+
+class ReservationResult:
+    """ Outcome of a reserve or cancel request """
+    BOOKED = "booked"
+    WAITLISTED = "waitlisted"
+    CANCELLED = "cancelled"
+    FULL = "full"                               # No free seat and the passenger did not want the waitlist
+    SEAT_TAKEN = "seat_taken"
+    INVALID_SEAT = "invalid_seat"               # The requested seat does not exist on the flight
+    WAITLIST_REFUSED = "waitlist_refused"       # The waitlist turned the passenger away, e.g. already on it
+    NOT_FOUND = "not_found"
+
+    def __init__(self, status, flight_no=None, seat_number=None):
+        self.status = status
+        self.flight_no = flight_no
+        self.seat_number = seat_number
+
+    @property
+    def ok(self):
+        return self.status in (self.BOOKED, self.WAITLISTED, self.CANCELLED)
+
+    def __repr__(self):
+        return f"ReservationResult({self.status}, flight {self.flight_no}, seat {self.seat_number})"
+
+class AsyncReservationService:
+    """ Reserve, cancel and search coroutines in front of a FlightReservationSystem, so bookings made here share its
+    passengers, fares, reaccommodation and, through a PersistentReservationSystem, its write-ahead log.
+    Requests on the same flight are serialised by a per-flight lock; the seat choice and waitlist preference are
+    arguments, never input(). """
+    def __init__(self, system=None):
+        self.system = FlightReservationSystem() if system is None else system
+        self.catalog = FlightCatalog()          # Route and fare index for search over the system's flights
+        self.catalog.bulk_load(self.system.flight_index.values())
+        self.locks = {}                         # flight_no -> asyncio.Lock
+
+    def _lock(self, flight_no):
+        lock = self.locks.get(flight_no)
+        if lock is None:
+            lock = self.locks[flight_no] = asyncio.Lock()
+        return lock
+
+    async def add_flight(self, flight_number, departure_time, origin, destination, price, seats):
+        """ Create a flight in the system and make it searchable; returns False if it already exists """
+        flight = self.system.add_flight(flight_number, departure_time, origin, destination, price, seats)
+        if flight is None:
+            return False
+        self.catalog.add_flight(flight)
+        return True
+
+    async def search(self, origin, destination, earliest="00:00", latest="23:59", max_price=None, limit=None):
+        """ Flights on a route within a departure window, cheapest first """
+        return self.catalog.search(origin, destination, earliest, latest, max_price, limit=limit)
+
+    async def reserve(self, flight_no, passenger_id, name=None, seat_number=None, join_waitlist=False,
+                      business_class=False):
+        """ Book seat_number (or the first free seat) on a flight, or join its waitlist when it is full """
+        async with self._lock(flight_no):
+            flight = self.system.find_flight(flight_no)
+            if flight is None:
+                return ReservationResult(ReservationResult.NOT_FOUND, flight_no)
+            booking = self.system.passenger_info.get(passenger_id)
+            if booking is not None:
+                return ReservationResult(ReservationResult.BOOKED, booking.flight_no, booking.seat_no)
+
+            seats = flight.get_seat_list()
+            if seat_number is None:
+                seat_number = seats.next_free_seat()
+            elif isinstance(seat_number, bool) or not isinstance(seat_number, int) or seat_number not in seats.seat_map:
+                return ReservationResult(ReservationResult.INVALID_SEAT, flight_no, seat_number)
+
+            if seat_number is None:
+                if not join_waitlist:
+                    return ReservationResult(ReservationResult.FULL, flight_no)
+                if not self.system.join_waitlist(flight_no, passenger_id, name, business_class):
+                    return ReservationResult(ReservationResult.WAITLIST_REFUSED, flight_no)
+                return ReservationResult(ReservationResult.WAITLISTED, flight_no)
+
+            if self.system.book(flight_no, passenger_id, seat_number, name, business_class) is None:
+                return ReservationResult(ReservationResult.SEAT_TAKEN, flight_no, seat_number)
+            return ReservationResult(ReservationResult.BOOKED, flight_no, seat_number)
+
+    async def cancel(self, passenger_id):
+        """ Cancel a passenger's booking and hand the seat to the waitlist """
+        while True:
+            booking = self.system.passenger_info.get(passenger_id)
+            if booking is None:
+                return ReservationResult(ReservationResult.NOT_FOUND)
+            async with self._lock(booking.flight_no):
+                # The booking may have been cancelled or moved to another flight while waiting for the lock
+                if self.system.passenger_info.get(passenger_id) is booking:
+                    self.system.cancel_reservation(passenger_id)
+                    return ReservationResult(ReservationResult.CANCELLED, booking.flight_no, booking.seat_no)
+
+async def run_load(service, sessions, requests_per_session, origins, destinations):
+    """ Drive concurrent booking sessions (search, reserve, sometimes cancel) and return per-request latencies """
+    latencies = []
+    loop = asyncio.get_running_loop()
+
+    async def session(session_id):
+        for request in range(requests_per_session):
+            passenger_id = session_id * requests_per_session + request
+
+            start_time = loop.time()
+            flights = await service.search(origins[passenger_id % len(origins)],
+                                           destinations[passenger_id % len(destinations)], limit=3)
+            latencies.append(loop.time() - start_time)
+            if not flights:
+                continue
+
+            start_time = loop.time()
+            result = await service.reserve(flights[0].flight_no, passenger_id, join_waitlist=True)
+            latencies.append(loop.time() - start_time)
+
+            if result.status == ReservationResult.BOOKED and passenger_id % 4 == 0:
+                start_time = loop.time()
+                await service.cancel(passenger_id)
+                latencies.append(loop.time() - start_time)
+
+            # Let the other sessions run between requests, as a network round trip would
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(session(session_id) for session_id in range(sessions)))
+    return latencies
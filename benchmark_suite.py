@@ -0,0 +1,327 @@
+""" Reproducible benchmark suite: seeded workloads, repeated timing with percentiles, memory, JSON and baselines
+
+    python benchmark_suite.py --scale small medium --output results.json
+    python benchmark_suite.py --scale small --baseline results.json      # exits with 1 on a regression
+
+Runs are compared against the stored small-scale baseline, benchmark_baseline.json, unless --no-baseline is
+given. Timings depend on the machine: refresh it with --output benchmark_baseline.json when moving to a new one.
+"""
+
+import argparse
+import heapq
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+SCALES = {
+    "small": {"cities": 500, "flights": 1000, "seats": 200, "operations": 10 ** 4, "queries": 20},
+    "medium": {"cities": 5000, "flights": 10 ** 4, "seats": 500, "operations": 10 ** 5, "queries": 20},
+    "large": {"cities": 50000, "flights": 10 ** 5, "seats": 1000, "operations": 10 ** 6, "queries": 10},
+}
+AIRLINES = ["AA", "UA", "DL", "WN", "B6"]
+BASELINE_FILE = Path(__file__).with_name("benchmark_baseline.json")
+
+# Seeded workload generators: the same seed and scale always produce the same workload
+
+def route_network(rng, cities, edges_per_city=3):
+    """ Connected Graph of cities: a random spanning tree plus extra random routes """
+    from map import Graph
+
+    graph = Graph()
+    names = [f"City_{index}" for index in range(cities)]
+    for name in names:
+        graph.add_node(name)
+    for index in range(1, cities):
+        graph.add_edge(names[index], names[rng.randrange(index)], rng.randint(100, 3000))
+    for _ in range(cities * (edges_per_city - 1)):
+        city1, city2 = rng.sample(names, 2)
+        graph.add_edge(city1, city2, rng.randint(100, 3000))
+    return graph
+
+def route_queries(rng, cities, count):
+    """ (origin, destination) pairs of distinct cities """
+    return [tuple(f"City_{index}" for index in rng.sample(range(cities), 2)) for _ in range(count)]
+
+def flight_schedule(rng, count, cities=200, max_seats=300):
+    """ Flights with unique numbers in random order, random times, routes, fares and cabin sizes """
+    from flights import Flight
+
+    numbers = [f"{AIRLINES[index % len(AIRLINES)]}{index}" for index in range(count)]
+    rng.shuffle(numbers)
+    flights = []
+    for number in numbers:
+        origin, destination = rng.sample(range(cities), 2)
+        flights.append(Flight(number, f"{rng.randint(0, 23):02}:{rng.randint(0, 59):02}", f"C{origin}",
+                              f"C{destination}", rng.randint(100, 1000), rng.randint(50, max_seats)))
+    return flights
+
+def booking_mix(rng, seats, operations, cancel_ratio=0.3):
+    """ ("book", seat, passenger_id) and ("cancel", seat) operations that are always valid when replayed in order """
+    free = list(range(1, seats + 1))
+    booked = []
+    mix = []
+    for passenger_id in range(operations):
+        if booked and (not free or rng.random() < cancel_ratio):
+            seat = booked.pop(rng.randrange(len(booked)))
+            free.append(seat)
+            mix.append(("cancel", seat))
+        else:
+            seat = free.pop(rng.randrange(len(free)))
+            booked.append(seat)
+            mix.append(("book", seat, passenger_id))
+    return mix
+
+def waitlist_churn(rng, operations, priorities=3, target_size=1000):
+    """ Insert, extract_max, update_priority and remove operations on a waitlist kept near target_size.
+    The waitlist is simulated alongside, so updates and removals always name a passenger who is still queued. """
+    keys = {}                                   # Queued passenger -> (-priority, arrival), the waitlist's order
+    heap = []                                   # (key, passenger_id) with stale entries skipped on extract
+    queued = []                                 # Queued passengers, for uniform random choices
+    slots = {}                                  # passenger_id -> index in queued
+
+    def take(passenger_id):
+        del keys[passenger_id]
+        index = slots.pop(passenger_id)
+        last = queued.pop()
+        if last != passenger_id:
+            queued[index] = last
+            slots[last] = index
+
+    churn = []
+    for passenger_id in range(operations):
+        choice = rng.random()
+        if not queued or choice < (0.6 if len(queued) < target_size else 0.4):
+            priority = rng.randint(1, priorities)
+            keys[passenger_id] = (-priority, passenger_id)
+            heapq.heappush(heap, (keys[passenger_id], passenger_id))
+            slots[passenger_id] = len(queued)
+            queued.append(passenger_id)
+            churn.append(("insert", passenger_id, priority))
+        elif choice < 0.8:
+            while keys.get(heap[0][1]) != heap[0][0]:
+                heapq.heappop(heap)
+            take(heapq.heappop(heap)[1])
+            churn.append(("extract",))
+        elif choice < 0.9:
+            updated = rng.choice(queued)
+            priority = rng.randint(1, priorities)
+            keys[updated] = (-priority, keys[updated][1])
+            heapq.heappush(heap, (keys[updated], updated))
+            churn.append(("update", updated, priority))
+        else:
+            removed = queued[rng.randrange(len(queued))]
+            take(removed)
+            churn.append(("remove", removed))
+    return churn
+
+# Cases: setup(rng, scale) builds the inputs untimed, run(inputs) is timed and returns the operation count
+
+def _dijkstra_setup(rng, scale):
+    return route_network(rng, scale["cities"]), route_queries(rng, scale["cities"], scale["queries"])
+
+def _run_dijkstra(inputs):
+    graph, queries = inputs
+    for origin, destination in queries:
+        graph.dijkstra(origin, destination)
+    return len(queries)
+
+def _run_bidirectional(inputs):
+    graph, queries = inputs
+    for origin, destination in queries:
+        graph.bidirectional_dijkstra(origin, destination)
+    return len(queries)
+
+def _avl_setup(rng, scale):
+    from flight_collection import FlightAVLTree
+    from flight_reservation_system import flight_sort_key
+
+    flights = flight_schedule(rng, scale["flights"])
+    return FlightAVLTree(), [(flight_sort_key(flight.flight_no), flight) for flight in flights]
+
+def _run_avl_insert(inputs):
+    tree, keyed = inputs
+    for key, flight in keyed:
+        tree.root = tree.insert(tree.root, key, flight)
+    return len(keyed)
+
+def _avl_sequential_setup(rng, scale):
+    from flight_collection import FlightAVLTree
+
+    # Increasing flight numbers, as in the original demo, are the worst case for lazy rebalancing
+    return FlightAVLTree(), [(number, None) for number in range(scale["flights"])]
+
+def _avl_search_setup(rng, scale):
+    tree, keyed = _avl_setup(rng, scale)
+    _run_avl_insert((tree, keyed))
+    return tree, [rng.choice(keyed)[0] for _ in range(scale["operations"])]
+
+def _run_avl_search(inputs):
+    tree, keys = inputs
+    for key in keys:
+        tree.search(tree.root, key)
+    return len(keys)
+
+def _seats_setup(make_seats):
+    def setup(rng, scale):
+        return make_seats(scale["seats"]), booking_mix(rng, scale["seats"], scale["operations"])
+    return setup
+
+def _linked_seats(size):
+    from flight_seats import FlightSeatsList
+    return FlightSeatsList(size)
+
+def _compact_seats(size):
+    from flight_seats import CompactFlightSeats
+    return CompactFlightSeats(size)
+
+def _run_booking_mix(inputs):
+    seats, mix = inputs
+    for operation in mix:
+        if operation[0] == "book":
+            seats.book_seat(operation[1], operation[2])
+        else:
+            seats.cancel_seat_booking(operation[1])
+    return len(mix)
+
+def _waitlist_setup(rng, scale):
+    from flights import Passenger
+    from waitlist import MaxHeapPriorityQueue
+
+    churn = waitlist_churn(rng, scale["operations"])
+    passengers = {operation[1]: Passenger(None, operation[1], operation[2])
+                  for operation in churn if operation[0] == "insert"}
+    return MaxHeapPriorityQueue(), churn, passengers
+
+def _run_waitlist(inputs):
+    queue, churn, passengers = inputs
+    for operation in churn:
+        kind = operation[0]
+        if kind == "insert":
+            queue.insert(passengers[operation[1]])
+        elif kind == "extract":
+            if not queue.is_empty():
+                queue.extract_max()
+        elif kind == "update":
+            if operation[1] in queue:
+                queue.update_priority(operation[1], operation[2])
+        else:
+            queue.remove(operation[1])
+    return len(churn)
+
+CASES = {
+    "graph.dijkstra": (_dijkstra_setup, _run_dijkstra),
+    "graph.bidirectional_dijkstra": (_dijkstra_setup, _run_bidirectional),
+    "avl.insert_random": (_avl_setup, _run_avl_insert),
+    "avl.insert_sequential": (_avl_sequential_setup, _run_avl_insert),
+    "avl.search": (_avl_search_setup, _run_avl_search),
+    "seats.linked_booking_mix": (_seats_setup(_linked_seats), _run_booking_mix),
+    "seats.compact_booking_mix": (_seats_setup(_compact_seats), _run_booking_mix),
+    "waitlist.churn": (_waitlist_setup, _run_waitlist),
+}
+
+def percentile(sorted_values, fraction):
+    """ Nearest-rank percentile of an already sorted list """
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+def measure(name, scale_name, repeats, seed):
+    """ Time a case repeats times on identical fresh inputs, then measure its peak memory in one traced run """
+    setup, run = CASES[name]
+    scale = SCALES[scale_name]
+
+    timings = []
+    for _ in range(repeats):
+        inputs = setup(random.Random(seed), scale)
+        start_time = time.perf_counter()
+        operations = run(inputs)
+        timings.append(time.perf_counter() - start_time)
+        del inputs
+
+    # Peak of setup plus run, since the structures being built are most of the footprint
+    tracemalloc.start()
+    run(setup(random.Random(seed), scale))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    median = percentile(timings, 0.5)
+    return {
+        "case": name,
+        "scale": scale_name,
+        "operations": operations,
+        "repeats": repeats,
+        "min": timings[0],
+        "p50": median,
+        "p90": percentile(timings, 0.9),
+        "p99": percentile(timings, 0.99),
+        "max": timings[-1],
+        "ops_per_second": operations / median if median else None,
+        "peak_memory_bytes": peak,
+    }
+
+def compare(results, baseline, tolerance, metric="min"):
+    """ Cases whose metric time grew by more than tolerance (a fraction) over the baseline run.
+    The fastest repeat is the default metric because it is the least disturbed by other load on the machine. """
+    previous = {(result["case"], result["scale"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["case"], result["scale"]))
+        if old is None or not old[metric]:
+            continue
+        ratio = result[metric] / old[metric]
+        marker = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{result['case']:>30} [{result['scale']}]: {old[metric] * 1000:10.2f} ms -> "
+              f"{result[metric] * 1000:10.2f} ms ({ratio:5.2f}x) {marker}")
+        if marker:
+            regressions.append(result)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the reproducible benchmark suite.")
+    parser.add_argument("--scale", nargs="+", choices=list(SCALES), default=["small"])
+    parser.add_argument("--case", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", default=str(BASELINE_FILE),
+                        help="JSON results of an earlier run to compare against (default: the stored baseline)")
+    parser.add_argument("--no-baseline", action="store_true", help="Do not compare against any baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown against the baseline (0.2 = 20%%)")
+    parser.add_argument("--metric", choices=["min", "p50", "p90", "p99"], default="min",
+                        help="Timing compared against the baseline")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scale_name in args.scale:
+        for name in args.case:
+            result = measure(name, scale_name, args.repeats, args.seed)
+            results.append(result)
+            print(f"{name:>30} [{scale_name}]: p50 {result['p50'] * 1000:10.2f} ms, "
+                  f"p90 {result['p90'] * 1000:10.2f} ms, {result['ops_per_second']:12.0f} ops/s, "
+                  f"{result['peak_memory_bytes'] / 2 ** 20:8.2f} MB peak")
+
+    report = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.baseline and not args.no_baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance, args.metric)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed by more than {args.tolerance:.0%}.")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
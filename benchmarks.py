@@ -0,0 +1,528 @@
+""" Benchmarks for the flight reservation data structures """
+
+import argparse
+import multiprocessing
+import random
+import resource
+import time
+
+def max_rss_mb():
+    """ Peak resident memory of the current process in megabytes """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _avl_case(size, strict, results):
+    """ Insert and look up size sequential flight numbers in a fresh process and report the numbers """
+    from flight_collection import FlightAVLTree
+
+    tree = FlightAVLTree(strict=strict)
+    rss_before = max_rss_mb()
+
+    # Sequential flight numbers, as in the flight_collection demo, are the worst case for lazy balancing
+    start_time = time.perf_counter()
+    for flight_no in range(size):
+        tree.root = tree.insert(tree.root, flight_no, None)
+    insert_time = time.perf_counter() - start_time
+
+    lookups = min(size, 10 ** 6)
+    keys = [random.randrange(size) for _ in range(lookups)]
+    start_time = time.perf_counter()
+    for key in keys:
+        tree.search(tree.root, key)
+    lookup_time = time.perf_counter() - start_time
+
+    results.put({
+        "size": size,
+        "mode": "strict" if strict else "lazy",
+        "height": tree.get_height(tree.root),
+        "inserts_per_sec": size / insert_time,
+        "lookups_per_sec": lookups / lookup_time,
+        "rss_mb": max_rss_mb() - rss_before,
+    })
+
+def benchmark_avl(sizes=(10 ** 5, 10 ** 6, 10 ** 7)):
+    """ Compare insert and lookup throughput and resident memory of strict and lazy AVL trees """
+    results = multiprocessing.Queue()
+    for size in sizes:
+        for strict in (True, False):
+            # Each case runs in its own process so peak RSS is not shared between cases
+            process = multiprocessing.Process(target=_avl_case, args=(size, strict, results))
+            process.start()
+            row = results.get()
+            process.join()
+            print(f"{row['size']:>10} {row['mode']:>6}: height {row['height']:>3}, "
+                  f"{row['inserts_per_sec']:>10.0f} inserts/s, {row['lookups_per_sec']:>10.0f} lookups/s, "
+                  f"{row['rss_mb']:>8.1f} MB")
+
+def benchmark_bulk_load(sizes=(10 ** 5, 10 ** 6)):
+    """ Compare building an AVL tree with one insert per flight against a single bulk load """
+    from flight_collection import FlightAVLTree
+
+    for size in sizes:
+        keys = list(range(size))
+        random.shuffle(keys)
+
+        tree = FlightAVLTree()
+        start_time = time.perf_counter()
+        for key in keys:
+            tree.root = tree.insert(tree.root, key, None)
+        insert_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        tree.root = tree.bulk_load(keys, key=lambda key: key)
+        bulk_time = time.perf_counter() - start_time
+
+        batch = [size + key for key in keys[: size // 10]]
+        start_time = time.perf_counter()
+        tree.root = tree.bulk_merge(tree.root, batch, key=lambda key: key)
+        merge_time = time.perf_counter() - start_time
+
+        print(f"{size:>10}: inserts {insert_time:.3f}s, bulk load {bulk_time:.3f}s, "
+              f"merge of {len(batch)} {merge_time:.3f}s, height {tree.get_height(tree.root)}")
+
+def benchmark_compiled_graph(sizes=(10 ** 4, 10 ** 5, 10 ** 6)):
+    """ Compare Dijkstra and memory of the dict-based Graph against the CSR CompiledGraph """
+    import tracemalloc
+    from map import Graph
+    from compact_graph import CompiledGraph
+
+    for edge_count in sizes:
+        cities = [f"City_{index}" for index in range(max(edge_count // 4, 2))]
+        edges = [(*random.sample(cities, 2), random.randint(100, 3000)) for _ in range(edge_count)]
+        queries = [random.sample(cities, 2) for _ in range(20)]
+
+        tracemalloc.start()
+        graph = Graph()
+        for city in cities:
+            graph.add_node(city)
+        for city1, city2, weight in edges:
+            graph.add_edge(city1, city2, weight)
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        compiled = CompiledGraph.from_edges(cities, edges)
+        compiled_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start_time = time.perf_counter()
+        for start_node, end_node in queries:
+            graph.dijkstra(start_node, end_node)
+        dict_time = (time.perf_counter() - start_time) / len(queries)
+
+        start_time = time.perf_counter()
+        for start_node, end_node in queries:
+            compiled.dijkstra(start_node, end_node)
+        compiled_time = (time.perf_counter() - start_time) / len(queries)
+
+        print(f"{edge_count:>10} edges: dict {dict_time * 1000:.2f} ms/query {dict_bytes / 2 ** 20:.1f} MB, "
+              f"CSR {compiled_time * 1000:.2f} ms/query {compiled_bytes / 2 ** 20:.1f} MB")
+
+def benchmark_seats(sizes=(1000,), flights=1000):
+    """ Compare memory and booking throughput of the linked-list and compact seat maps """
+    import tracemalloc
+    from flight_seats import FlightSeatsList, CompactFlightSeats
+
+    for size in sizes:
+        for seat_class in (FlightSeatsList, CompactFlightSeats):
+            tracemalloc.start()
+            schedule = [seat_class(size) for _ in range(flights)]
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            # Distinct seats so every booking and every cancellation succeeds
+            picks = random.sample(range(flights * size), min(10 ** 5, flights * size))
+            operations = [(schedule[pick // size], pick % size + 1) for pick in picks]
+            start_time = time.perf_counter()
+            for seats, seat_number in operations:
+                seats.book_seat(seat_number, 1)
+            for seats, seat_number in operations:
+                seats.cancel_seat_booking(seat_number)
+            elapsed = time.perf_counter() - start_time
+
+            print(f"{seat_class.__name__:>18} x {flights} flights of {size} seats: "
+                  f"{memory / 2 ** 20:8.1f} MB, {2 * len(operations) / elapsed:10.0f} book/cancel per second")
+
+def benchmark_concurrent_booking(sizes=(1, 2, 4, 8), flights=200, seats=100, attempts=20000):
+    """ Threads racing to book random seats: throughput per thread count and a double-booking check """
+    import threading
+    from flights import Flight
+    from booking_engine import ConcurrentBookingEngine
+
+    for thread_count in sizes:
+        engine = ConcurrentBookingEngine(Flight(number, "08:00", "A", "B", 100, seats) for number in range(flights))
+        successes = [[] for _ in range(thread_count)]
+
+        def worker(thread_index):
+            rng = random.Random(thread_index)
+            won = successes[thread_index]
+            for _ in range(attempts):
+                flight_no, seat_number = rng.randrange(flights), rng.randint(1, seats)
+                if engine.book(flight_no, seat_number, thread_index):
+                    won.append((flight_no, seat_number))
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(thread_count)]
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start_time
+
+        won = [booking for thread_won in successes for booking in thread_won]
+        booked = sum(seats - engine.available_seats(number) for number in range(flights))
+        double_bookings = len(won) - len(set(won))
+        print(f"{thread_count:>3} threads: {thread_count * attempts / elapsed:10.0f} attempts/s, "
+              f"{len(won)} booked, {booked} seats taken, {double_bookings} double bookings")
+
+def benchmark_async_reservations(sizes=(1000, 5000), requests_per_session=10):
+    """ Requests per second and p99 latency of the asyncio reservation API under many concurrent sessions """
+    import asyncio
+    from flights import Flight
+    from async_reservation import AsyncReservationService, run_load
+    from flight_reservation_system import FlightReservationSystem
+
+    origins = ["New York", "Los Angeles", "Miami", "Houston"]
+    destinations = ["Dallas", "Las Vegas", "Boston", "Chicago"]
+    for sessions in sizes:
+        flights = [Flight(number, f"{random.randint(0, 23):02}:{random.randint(0, 59):02}",
+                          random.choice(origins), random.choice(destinations), random.randint(100, 1000), 50)
+                   for number in range(500)]
+        system = FlightReservationSystem()
+        system.load_flights(flights)
+        service = AsyncReservationService(system)
+
+        start_time = time.perf_counter()
+        latencies = asyncio.run(run_load(service, sessions, requests_per_session, origins, destinations))
+        elapsed = time.perf_counter() - start_time
+
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99)]
+        print(f"{sessions:>7} sessions: {len(latencies) / elapsed:10.0f} requests/s, "
+              f"p99 {p99 * 1000:.3f} ms over {len(latencies)} requests")
+
+def benchmark_flight_lookup(sizes=(10 ** 4, 10 ** 5, 10 ** 6), lookups=10 ** 5):
+    """ Point lookup latency of FlightReservationSystem's hash index against the ordered tree """
+    from flights import Flight
+    from flight_reservation_system import FlightReservationSystem, flight_sort_key
+
+    airlines = ["AA", "UA", "DL", "WN", "B6"]
+    for size in sizes:
+        system = FlightReservationSystem()
+        numbers = [f"{airlines[index % len(airlines)]}{index}" for index in range(size)]
+        system.load_flights(Flight(number, "08:00", "JFK", "LAX", 300, 1) for number in numbers)
+        queries = [random.choice(numbers) for _ in range(lookups)]
+
+        start_time = time.perf_counter()
+        for number in queries:
+            system.find_flight(number)
+        hash_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for number in queries:
+            system.flights.search(system.flights.root, flight_sort_key(number))
+        tree_time = time.perf_counter() - start_time
+
+        print(f"{size:>10} flights: hash {hash_time / lookups * 1e9:8.0f} ns/lookup, "
+              f"tree {tree_time / lookups * 1e9:8.0f} ns/lookup")
+
+def benchmark_waitlist_promotion(sizes=(10 ** 3, 10 ** 4, 10 ** 5)):
+    """ Promotions per second, one at a time on cancellation and in bulk on an aircraft swap """
+    import contextlib
+    import io
+    from flight_reservation_system import FlightReservationSystem
+
+    for size in sizes:
+        system = FlightReservationSystem()
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.add_flight("AA100", "08:00", "JFK", "LAX", 300, size)
+        for passenger_id in range(size):
+            system.book("AA100", passenger_id)
+        for passenger_id in range(size, 3 * size):
+            system.join_waitlist("AA100", passenger_id, business_class=passenger_id % 5 == 0)
+
+        # Every cancellation promotes the top waitlisted passenger into the freed seat
+        start_time = time.perf_counter()
+        for passenger_id in range(size):
+            system.cancel_reservation(passenger_id)
+        cancel_rate = size / (time.perf_counter() - start_time)
+
+        # Doubling the cabin seats the rest of the waitlist in one batch
+        start_time = time.perf_counter()
+        promoted = system.change_aircraft("AA100", 2 * size)
+        bulk_rate = len(promoted) / (time.perf_counter() - start_time)
+
+        print(f"{size:>8} seats: {cancel_rate:10.0f} promotions/s on cancel, "
+              f"{bulk_rate:10.0f} promotions/s on aircraft swap")
+
+def benchmark_reaccommodation(sizes=(500,), passengers=50000, cancelled_share=0.2):
+    """ Mass disruption: cancel a share of the schedule and rebook every displaced passenger """
+    from flights import Flight, Passenger
+    from reaccommodation import ReaccommodationEngine
+
+    for flight_count in sizes:
+        routes = [(f"City_{index}", f"City_{index + 1}") for index in range(max(flight_count // 10, 1))]
+        capacity = 2 * passengers // flight_count
+        flights = []
+        for number in range(flight_count):
+            origin, destination = routes[number % len(routes)]
+            departure = random.randint(0, 23 * 60)
+            flights.append(Flight(number, f"{departure // 60:02}:{departure % 60:02}", origin, destination,
+                                  random.randint(100, 1000), capacity))
+
+        # Book every passenger, then put a tenth of them on waitlists too
+        for passenger_id in range(passengers):
+            flight = flights[passenger_id % flight_count]
+            passenger = Passenger(None, passenger_id, random.randint(1, 3))
+            passenger.seat_number = flight.seat_linked_list.next_free_seat()
+            flight.seat_linked_list.book_seat(passenger.seat_number, passenger_id)
+            flight.passengers[passenger_id] = passenger
+        for passenger_id in range(passengers, passengers + passengers // 10):
+            flights[passenger_id % flight_count].waiting_list.insert(Passenger(None, passenger_id, random.randint(1, 3)))
+
+        engine = ReaccommodationEngine(flights)
+        cancelled = random.sample(flights, int(flight_count * cancelled_share))
+        moved = waitlisted = stranded = 0
+        start_time = time.perf_counter()
+        for flight in cancelled:
+            result = engine.cancel_flight(flight)
+            moved += len(result.moved)
+            waitlisted += len(result.waitlisted)
+            stranded += len(result.stranded)
+        elapsed = time.perf_counter() - start_time
+
+        displaced = moved + waitlisted + stranded
+        print(f"{flight_count} flights, {passengers} passengers, {len(cancelled)} cancelled: "
+              f"{displaced} displaced in {elapsed:.3f}s ({displaced / elapsed:.0f}/s), "
+              f"{moved} moved, {waitlisted} waitlisted, {stranded} stranded")
+
+def benchmark_recovery(sizes=(10 ** 5, 10 ** 6), seats_per_flight=200):
+    """ Time to recover reservation state from the write-ahead log alone and from a snapshot """
+    import contextlib
+    import io
+    import shutil
+    import tempfile
+    from persistence import PersistentReservationSystem
+
+    for bookings in sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            flight_count = bookings // seats_per_flight
+            with contextlib.redirect_stdout(io.StringIO()):
+                store = PersistentReservationSystem(directory)
+                for number in range(flight_count):
+                    store.add_flight(f"AA{number}", "08:00", "JFK", "LAX", 300, seats_per_flight)
+
+            start_time = time.perf_counter()
+            for passenger_id in range(bookings):
+                store.book(f"AA{passenger_id % flight_count}", passenger_id)
+            write_time = time.perf_counter() - start_time
+            store.close()
+
+            start_time = time.perf_counter()
+            store = PersistentReservationSystem(directory)
+            log_time = time.perf_counter() - start_time
+
+            store.checkpoint()
+            store.close()
+            start_time = time.perf_counter()
+            store = PersistentReservationSystem(directory)
+            snapshot_time = time.perf_counter() - start_time
+            store.close()
+
+            print(f"{bookings:>9} bookings: logged at {bookings / write_time:8.0f}/s, "
+                  f"recovery from log {log_time:.2f}s, from snapshot {snapshot_time:.2f}s "
+                  f"({len(store.system.passenger_info)} bookings restored)")
+        finally:
+            shutil.rmtree(directory)
+
+def benchmark_catalog_startup(sizes=(10 ** 4, 10 ** 5, 10 ** 6), lookups=1000):
+    """ Worker startup from a memory-mapped catalog against building every Flight with load_flights """
+    import os
+    import shutil
+    import tempfile
+    from flights import Flight
+    from flight_reservation_system import FlightReservationSystem
+    from mapped_catalog import MappedFlightCatalog, write_catalog
+
+    cities = [f"C{index}" for index in range(200)]
+    for size in sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "flights.cat")
+            flights = [Flight(f"AA{number}", f"{random.randint(0, 23):02}:{random.randint(0, 59):02}",
+                              random.choice(cities), random.choice(cities), random.randint(100, 1000), 180)
+                       for number in range(size)]
+            write_catalog(path, flights)
+            queries = [f"AA{number}" for number in random.sample(range(size), min(size, lookups))]
+
+            start_time = time.perf_counter()
+            system = FlightReservationSystem()
+            system.load_flights(Flight(flight.flight_no, flight.departure_time, flight.origin, flight.destination,
+                                       flight.price, flight.seat_numbers) for flight in flights)
+            build_time = time.perf_counter() - start_time
+            del system, flights
+
+            start_time = time.perf_counter()
+            system = FlightReservationSystem(MappedFlightCatalog(path))
+            open_time = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            for number in queries:
+                system.book(number, number)
+            booking_time = time.perf_counter() - start_time
+            system.catalog.close()
+
+            print(f"{size:>9} flights: load_flights {build_time * 1000:9.1f} ms, mapped catalog open "
+                  f"{open_time * 1000:6.3f} ms, first {lookups} bookings {booking_time * 1000:6.1f} ms "
+                  f"({os.path.getsize(path) / 2 ** 20:.1f} MB file)")
+        finally:
+            shutil.rmtree(directory)
+
+STARTUP_MODULES = ("flight_seats", "waitlist", "flights", "flight_collection", "map", "itinerary",
+                   "flight_search", "reaccommodation", "flight_reservation_system", "booking_engine",
+                   "async_reservation", "persistence", "mapped_catalog")
+
+def benchmark_startup(sizes=(5,), modules=STARTUP_MODULES):
+    """ Import latency and allocated memory of each module in a fresh interpreter; sizes is the number of runs """
+    import os
+    import subprocess
+    import sys
+
+    # Latency is timed without tracemalloc, which slows imports down; memory is measured in a separate run
+    timing_probe = ("import time\n"
+                    "start = time.perf_counter()\n"
+                    "import {module}\n"
+                    "print(time.perf_counter() - start)")
+    memory_probe = ("import tracemalloc\n"
+                    "tracemalloc.start()\n"
+                    "import {module}\n"
+                    "print(tracemalloc.get_traced_memory()[0])")
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    def run(probe, module):
+        output = subprocess.run([sys.executable, "-c", probe.format(module=module)], cwd=directory,
+                                capture_output=True, text=True, check=True).stdout
+        return float(output.split()[-1])        # Last line, after anything the module printed
+
+    for runs in sizes:
+        print(f"median of {runs} runs:")
+        for module in modules:
+            latencies = sorted(run(timing_probe, module) for _ in range(runs))
+            allocated = run(memory_probe, module)
+            print(f"{module:>26}: import {latencies[len(latencies) // 2] * 1000:7.2f} ms, "
+                  f"{allocated / 2 ** 20:6.2f} MB allocated")
+
+def benchmark_metrics_overhead(sizes=(5,), scale="medium"):
+    """ Hot-path cost of the metrics layer: benchmark suite cases with metrics on and off; sizes is the repeats """
+    import metrics
+    from benchmark_suite import CASES, SCALES
+
+    cases = ["avl.insert_random", "seats.linked_booking_mix", "seats.compact_booking_mix", "waitlist.churn"]
+    for repeats in sizes:
+        for name in cases:
+            setup, run = CASES[name]
+            best = {"off": float('inf'), "on": float('inf')}
+            # Alternate the two states so drifting machine load affects both alike
+            for _ in range(repeats):
+                for state in ("off", "on"):
+                    metrics.enable() if state == "on" else metrics.disable()
+                    inputs = setup(random.Random(42), SCALES[scale])
+                    start_time = time.perf_counter()
+                    run(inputs)
+                    best[state] = min(best[state], time.perf_counter() - start_time)
+            metrics.enable()
+            print(f"{name:>26}: metrics off {best['off'] * 1000:8.2f} ms, on {best['on'] * 1000:8.2f} ms "
+                  f"({(best['on'] / best['off'] - 1) * 100:+5.1f}%)")
+
+def benchmark_sharded_booking(sizes=None, flights=2000, seats_per_flight=200, batch_size=2000):
+    """ Booking throughput of ShardedReservationSystem by shard count, against one in-process system;
+    sizes are the shard counts, by default powers of two up to the core count """
+    import contextlib
+    import io
+    import os
+    from flight_reservation_system import FlightReservationSystem
+    from sharded_reservation import ShardedReservationSystem
+
+    cores = os.cpu_count() or 1
+    shard_counts = sizes or sorted({2 ** power for power in range(cores.bit_length())} | {cores})
+    bookings = flights * seats_per_flight
+    numbers = [f"AA{number}" for number in range(flights)]
+    operations = [("book", (numbers[passenger_id % flights], passenger_id)) for passenger_id in range(bookings)]
+
+    system = FlightReservationSystem()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for number in numbers:
+            system.add_flight(number, "08:00", "JFK", "LAX", 300, seats_per_flight)
+    start_time = time.perf_counter()
+    for _, (number, passenger_id) in operations:
+        system.book(number, passenger_id)
+    single_rate = bookings / (time.perf_counter() - start_time)
+    print(f"{cores} cores; in-process system: {single_rate:10.0f} bookings/s")
+    del system
+
+    for shard_count in shard_counts:
+        with ShardedReservationSystem(shard_count) as sharded:
+            sharded.execute([("add_flight", (number, "08:00", "JFK", "LAX", 300, seats_per_flight))
+                             for number in numbers])
+            start_time = time.perf_counter()
+            for index in range(0, bookings, batch_size):
+                sharded.execute(operations[index:index + batch_size])
+            rate = bookings / (time.perf_counter() - start_time)
+        print(f"{shard_count:>3} shards: {rate:10.0f} bookings/s ({rate / single_rate:4.2f}x in-process)")
+
+def benchmark_pricing(sizes=(10 ** 4, 10 ** 5, 10 ** 6), events=10 ** 5):
+    """ Incremental repricing per booking event, and whole-schedule repricing with and without NumPy """
+    import pricing
+    from flights import Flight
+
+    for size in sizes:
+        flights = [Flight(f"AA{number}", f"{random.randint(0, 23):02}:{random.randint(0, 59):02}", "JFK", "LAX",
+                          random.randint(100, 1000), 200) for number in range(size)]
+        engine = pricing.PricingEngine(flights, now="06:00")
+        targets = [random.choice(flights) for _ in range(events)]
+
+        start_time = time.perf_counter()
+        for flight in targets:
+            engine.update(flight)
+        update_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        engine.advance_clock("07:00", vectorized=False)
+        loop_time = time.perf_counter() - start_time
+
+        if pricing.np is None:
+            vectorized = "NumPy not installed"
+        else:
+            start_time = time.perf_counter()
+            engine.advance_clock("08:00", vectorized=True)
+            vectorized = f"NumPy {(time.perf_counter() - start_time) * 1000:8.1f} ms"
+        print(f"{size:>9} flights: {events / update_time:9.0f} incremental reprices/s, full reprice: "
+              f"loop {loop_time * 1000:8.1f} ms, {vectorized}")
+
+BENCHMARKS = {
+    "avl": benchmark_avl,
+    "bulk_load": benchmark_bulk_load,
+    "compiled_graph": benchmark_compiled_graph,
+    "seats": benchmark_seats,
+    "concurrent_booking": benchmark_concurrent_booking,
+    "async_reservations": benchmark_async_reservations,
+    "flight_lookup": benchmark_flight_lookup,
+    "waitlist_promotion": benchmark_waitlist_promotion,
+    "reaccommodation": benchmark_reaccommodation,
+    "recovery": benchmark_recovery,
+    "catalog_startup": benchmark_catalog_startup,
+    "startup": benchmark_startup,
+    "metrics_overhead": benchmark_metrics_overhead,
+    "sharded_booking": benchmark_sharded_booking,
+    "pricing": benchmark_pricing,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a data structure benchmark.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--sizes", type=int, nargs="+", help="Problem sizes to run")
+    args = parser.parse_args()
+
+    if args.sizes:
+        BENCHMARKS[args.benchmark](args.sizes)
+    else:
+        BENCHMARKS[args.benchmark]()
@@ -0,0 +1,108 @@
+""" Thread-safe booking and cancellation with one lock per flight """
+
+import threading
+
+class ConcurrentBookingEngine:
+    """ Books and cancels seats from many threads; operations on different flights never wait for each other """
+    def __init__(self, flights=()):
+        self.flights = {}                           # flight_no -> Flight
+        self.locks = {}                             # flight_no -> lock guarding that flight's seats and waitlist
+        self.registry_lock = threading.Lock()       # Guards adding and removing flights only
+        for flight in flights:
+            self.add_flight(flight)
+
+    def add_flight(self, flight):
+        """ Register a flight and its lock """
+        with self.registry_lock:
+            if flight.flight_no not in self.flights:
+                self.locks[flight.flight_no] = threading.Lock()
+                self.flights[flight.flight_no] = flight
+
+    def remove_flight(self, flight_no):
+        """ Unregister a flight once no booking holds its lock """
+        with self.registry_lock:
+            lock = self.locks.get(flight_no)
+            if lock is None:
+                return None
+            with lock:
+                del self.locks[flight_no]
+                return self.flights.pop(flight_no)
+
+    def _locked(self, flight_no):
+        """ (flight, lock) for a flight number, or (None, None) """
+        lock = self.locks.get(flight_no)
+        if lock is None:
+            print(f"Flight {flight_no} not found")
+            return None, None
+        return self.flights[flight_no], lock
+
+    def book(self, flight_no, seat_number, passenger_id):
+        """ Book one seat; the availability check and the write happen under the flight's lock """
+        flight, lock = self._locked(flight_no)
+        if flight is None:
+            return False
+        with lock:
+            seats = flight.get_seat_list()
+            if seats.is_booked(seat_number):
+                return False
+            return seats.book_seat(seat_number, passenger_id)
+
+    def book_group(self, flight_no, seat_numbers, passenger_ids):
+        """ Book several seats on one flight all or nothing """
+        flight, lock = self._locked(flight_no)
+        if flight is None:
+            return False
+        with lock:
+            seats = flight.get_seat_list()
+            if any(seats.is_booked(seat_number) for seat_number in seat_numbers):
+                return False
+            return seats.book_seats(seat_numbers, passenger_ids)
+
+    def book_adjacent(self, flight_no, count, passenger_ids):
+        """ Book count adjacent seats on one flight and return their numbers, or None """
+        flight, lock = self._locked(flight_no)
+        if flight is None:
+            return None
+        with lock:
+            return flight.get_seat_list().book_adjacent_seats(count, passenger_ids)
+
+    def cancel(self, flight_no, seat_number):
+        """ Cancel the booking of one seat """
+        flight, lock = self._locked(flight_no)
+        if flight is None:
+            return False
+        with lock:
+            seats = flight.get_seat_list()
+            if not seats.is_booked(seat_number):
+                return False
+            return seats.cancel_seat_booking(seat_number)
+
+    def cancel_and_promote(self, flight_no, seat_number, skip=None):
+        """ Cancel a seat and, in the same locked step, seat the highest priority waitlisted passenger on it.
+        Waitlisted passengers for whom skip(passenger) is true (e.g. already booked elsewhere) are dropped.
+        Returns the promoted passengers, or None if the seat was not booked. """
+        flight, lock = self._locked(flight_no)
+        if flight is None:
+            return None
+        with lock:
+            seats = flight.get_seat_list()
+            if not seats.is_booked(seat_number):
+                return None
+            seats.cancel_seat_booking(seat_number)
+            return flight.promote_waitlist([seat_number], skip)
+
+    def join_waitlist(self, flight_no, passenger):
+        """ Add a passenger to a flight's waiting list; returns False if the flight is unknown or they already wait """
+        flight, lock = self._locked(flight_no)
+        if flight is None:
+            return False
+        with lock:
+            return flight.waiting_list.insert(passenger)
+
+    def available_seats(self, flight_no):
+        """ Number of free seats on a flight """
+        flight, lock = self._locked(flight_no)
+        if flight is None:
+            return 0
+        with lock:
+            return flight.get_seat_list().available_count
@@ -0,0 +1,117 @@
+""" Frozen graph of flight routes stored as compressed sparse row arrays """
+
+import heapq
+from array import array
+
+try:
+    import numpy as np
+except ImportError:                         # NumPy is optional, the arrays work without it
+    np = None
+
+class CompiledGraph:
+    """ Read-only route network with cities interned to integer ids and CSR adjacency """
+    def __init__(self, cities, offsets, targets, weights):
+        self.cities = cities                                        # id -> city name
+        self.city_ids = {city: index for index, city in enumerate(cities)}   # city name -> id
+        self.offsets = offsets              # Neighbors of city i are targets[offsets[i]:offsets[i + 1]]
+        self.targets = targets              # Neighbor city ids
+        self.weights = weights              # Edge weights, parallel to targets
+
+    @classmethod
+    def from_edges(cls, cities, edges):
+        """ Build from city names and (city1, city2, weight) bi-directional routes, with a counting sort by origin """
+        cities = list(cities)
+        city_ids = {city: index for index, city in enumerate(cities)}
+
+        degree = [0] * (len(cities) + 1)
+        for city1, city2, _ in edges:
+            degree[city_ids[city1] + 1] += 1
+            degree[city_ids[city2] + 1] += 1
+        for index in range(len(cities)):
+            degree[index + 1] += degree[index]
+
+        offsets = array("q", degree)
+        targets = array("i", bytes(4 * degree[-1]))
+        weights = array("d", bytes(8 * degree[-1]))
+        position = degree[:-1]
+        for city1, city2, weight in edges:
+            node1, node2 = city_ids[city1], city_ids[city2]
+            targets[position[node1]] = node2
+            weights[position[node1]] = weight
+            position[node1] += 1
+            targets[position[node2]] = node1
+            weights[position[node2]] = weight
+            position[node2] += 1
+
+        return cls(cities, offsets, targets, weights)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """ Freeze a dict-based Graph """
+        cities = list(graph.adjacency_list)
+        city_ids = {city: index for index, city in enumerate(cities)}
+        offsets = array("q", [0])
+        targets = array("i")
+        weights = array("d")
+        for city in cities:
+            for neighbor in graph.adjacency_list[city]:
+                targets.append(city_ids[neighbor])
+                weights.append(graph.weights[(city, neighbor)])
+            offsets.append(len(targets))
+        return cls(cities, offsets, targets, weights)
+
+    def __len__(self):
+        return len(self.cities)
+
+    def edge_count(self):
+        """ Number of bi-directional routes """
+        return len(self.targets) // 2
+
+    def nbytes(self):
+        """ Bytes held by the CSR arrays """
+        return sum(len(values) * values.itemsize for values in (self.offsets, self.targets, self.weights))
+
+    def as_numpy(self):
+        """ Zero-copy NumPy views of the (offsets, targets, weights) arrays """
+        if np is None:
+            raise ImportError("NumPy is required for as_numpy().")
+        return (np.frombuffer(self.offsets, dtype=np.int64),
+                np.frombuffer(self.targets, dtype=np.int32),
+                np.frombuffer(self.weights, dtype=np.float64))
+
+    def dijkstra(self, start_node, end_node):
+        """ Dijkstra's algorithm over the CSR arrays, returning (path, distance) like Graph.dijkstra """
+        start = self.city_ids.get(start_node)
+        end = self.city_ids.get(end_node)
+        if start is None or end is None:
+            return None, float('inf')
+
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        distances = [float('inf')] * len(self.cities)
+        previous_nodes = [-1] * len(self.cities)
+        distances[start] = 0
+        pq = [(0, start)]
+
+        while pq:
+            current_distance, current_node = heapq.heappop(pq)
+            if current_node == end:
+                path = [self.cities[end]]
+                while current_node != start:
+                    current_node = previous_nodes[current_node]
+                    path.append(self.cities[current_node])
+                path.reverse()
+                return path, current_distance
+
+            # Skip stale queue entries
+            if current_distance > distances[current_node]:
+                continue
+
+            for edge in range(offsets[current_node], offsets[current_node + 1]):
+                neighbor = targets[edge]
+                distance = current_distance + weights[edge]
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    previous_nodes[neighbor] = current_node
+                    heapq.heappush(pq, (distance, neighbor))
+
+        return None, float('inf')
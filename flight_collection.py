@@ -1,11 +1,15 @@
 """ Balanced binary search tree to maintain flight records and help in sorting """
 
+import heapq
 import random
 import time
-from flights import Flight
+
+import metrics
 
 class AVLNode:
     """ Individual flight node which will be inserted in the AVL tree """
+    __slots__ = ("key", "flight", "left", "right", "height", "size")
+
     def __init__(self, key, flight):
         self.key = key                      # Key used for sorting (e.g., flight_id, price, departure_time)
         self.flight = flight                # Flight object associated with this node
@@ -16,9 +20,15 @@ class AVLNode:
 
 class FlightAVLTree:
     """ Collection of flights that will be used for sorting and retrieval """
-    def __init__(self, rebalance_threshold=2):
+    def __init__(self, rebalance_threshold=2, strict=False):
         self.root = None
-        self.rebalance_threshold = rebalance_threshold  # Set a threshold for lazy rebalancing
+        # Strict mode keeps the classic AVL invariant (|balance| <= 1), otherwise rebalancing is lazy
+        self.rebalance_threshold = 1 if strict else rebalance_threshold
+
+    @property
+    def strict(self):
+        """ True when the tree keeps the classic AVL balance invariant """
+        return self.rebalance_threshold <= 1
 
     def get_height(self, node):
         """ Helper function to get the height of a node """
@@ -48,6 +58,8 @@ class FlightAVLTree:
         # Perform rotation
         x.right = y
         y.left = temp
+        if metrics.enabled:
+            metrics.AVL_ROTATIONS.inc()
 
         # Update heights and sizes
         self.update_node_attributes(y)
@@ -64,6 +76,8 @@ class FlightAVLTree:
         # Perform rotation
         y.left = x
         x.right = temp
+        if metrics.enabled:
+            metrics.AVL_ROTATIONS.inc()
 
         # Update heights and sizes
         self.update_node_attributes(x)
@@ -72,130 +86,267 @@ class FlightAVLTree:
         # Return the new root
         return y
 
+    def rebalance(self, node):
+        """ Rotate the node if its imbalance exceeds the threshold and return the new subtree root """
+        balance = self.get_balance(node)
+
+        if balance > self.rebalance_threshold:
+            if self.get_balance(node.left) < 0:                 # Left Right Case
+                node.left = self.left_rotate(node.left)
+            return self.right_rotate(node)                      # Left Left Case
+
+        if balance < -self.rebalance_threshold:
+            if self.get_balance(node.right) > 0:                # Right Left Case
+                node.right = self.right_rotate(node.right)
+            return self.left_rotate(node)                       # Right Right Case
+
+        return node
+
+    def retrace(self, path):
+        """ Update and rebalance the nodes on a root-to-leaf path bottom up and return the new root """
+        subtree = None
+        for index in range(len(path) - 1, -1, -1):
+            node = path[index]
+            self.update_node_attributes(node)
+            subtree = self.rebalance(node)
+
+            # Reattach the rotated subtree to its parent
+            if subtree is not node and index > 0:
+                parent = path[index - 1]
+                if parent.left is node:
+                    parent.left = subtree
+                else:
+                    parent.right = subtree
+        return subtree
+
     def insert(self, root, key, flight):
         """ Insert a flight into the AVL tree and return the new root of the subtree """
-        # Perform standard BST insert
-        if not root:
-            return AVLNode(key, flight)
-        elif key < root.key:
-            root.left = self.insert(root.left, key, flight)
+        new_node = AVLNode(key, flight)
+        if root is None:
+            return new_node
+
+        # Perform standard BST insert, remembering the path from the root
+        path = []
+        node = root
+        while node is not None:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+
+        parent = path[-1]
+        if key < parent.key:
+            parent.left = new_node
         else:
-            root.right = self.insert(root.right, key, flight)
-
-        # Update the node's attributes (height and size)
-        self.update_node_attributes(root)
+            parent.right = new_node
 
-        # Get the balance factor to check if this node became unbalanced
-        balance = self.get_balance(root)
-
-        # If the node is unbalanced and the imbalance exceeds the lazy threshold, perform rotations
-        if balance > self.rebalance_threshold and key < root.left.key:          # Left Left Case
-            return self.right_rotate(root)
-        if balance < -self.rebalance_threshold and key > root.right.key:        # Right Right Case
-            return self.left_rotate(root)
-        if balance > self.rebalance_threshold and key > root.left.key:          # Left Right Case
-            root.left = self.left_rotate(root.left)
-            return self.right_rotate(root)
-        if balance < -self.rebalance_threshold and key < root.right.key:        # Right Left Case
-            root.right = self.right_rotate(root.right)
-            return self.left_rotate(root)
-
-        return root
+        if metrics.enabled:
+            metrics.AVL_PATH_LENGTH.observe(len(path))
+        return self.retrace(path)
 
     def find_min(self, root):
         """ Find the node with the smallest value (used for deletion) """
-        if root is None or root.left is None:
-            return root
-        return self.find_min(root.left)
+        node = root
+        while node is not None and node.left is not None:
+            node = node.left
+        return node
 
     def delete(self, root, key):
-        """ Delete a flight from the AVL tree """
-        # Perform standard BST delete
-        if not root:
+        """ Delete a flight from the AVL tree and return the new root of the subtree """
+        # Find the node, remembering the path from the root
+        path = []
+        node = root
+        while node is not None and node.key != key:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+
+        if node is None:
             return root
-        elif key < root.key:
-            root.left = self.delete(root.left, key)
-        elif key > root.key:
-            root.right = self.delete(root.right, key)
+
+        if node.left is not None and node.right is not None:
+            # Node with two children: copy the inorder successor (smallest in the right subtree) here
+            path.append(node)
+            successor = node.right
+            while successor.left is not None:
+                path.append(successor)
+                successor = successor.left
+            node.key = successor.key
+            node.flight = successor.flight
+            removed, replacement = successor, successor.right
         else:
             # Node with only one child or no child
-            if root.left is None:
-                return root.right
-            elif root.right is None:
-                return root.left
-
-            # Node with two children: Get the inorder successor (smallest in the right subtree)
-            temp = self.find_min(root.right)
+            removed, replacement = node, node.left if node.left is not None else node.right
 
-            # Copy the inorder successor's content to this node
-            root.key = temp.key
-            root.flight = temp.flight
+        if not path:
+            return replacement
 
-            # Delete the inorder successor
-            root.right = self.delete(root.right, temp.key)
-
-        # If the tree has only one node, return it
-        if not root:
+        parent = path[-1]
+        if parent.left is removed:
+            parent.left = replacement
+        else:
+            parent.right = replacement
+
+        if metrics.enabled:
+            metrics.AVL_PATH_LENGTH.observe(len(path))
+        return self.retrace(path)
+
+    def build_from_sorted(self, items, low=0, high=None):
+        """ Build a perfectly balanced subtree from sorted (key, flight) pairs in O(n) and return its root """
+        if high is None:
+            high = len(items)
+        if low >= high:
+            return None
+
+        middle = (low + high) // 2
+        node = AVLNode(*items[middle])
+        node.left = self.build_from_sorted(items, low, middle)
+        node.right = self.build_from_sorted(items, middle + 1, high)
+        self.update_node_attributes(node)
+        return node
+
+    def bulk_load(self, flights, key=lambda flight: flight.flight_no, presorted=False):
+        """ Build a balanced tree from a batch of flights, sorting it once, and return the new root """
+        items = [(key(flight), flight) for flight in flights]
+        if not presorted:
+            items.sort(key=lambda item: item[0])
+        return self.build_from_sorted(items)
+
+    def bulk_merge(self, root, flights, key=lambda flight: flight.flight_no, presorted=False):
+        """ Fold a batch of flights into the tree rooted at root and return the new root """
+        items = [(key(flight), flight) for flight in flights]
+        if not presorted:
+            items.sort(key=lambda item: item[0])
+
+        # A small batch is cheaper to insert one by one than to rebuild the whole tree
+        size = self.get_size(root)
+        if len(items) * max(size.bit_length(), 1) < size:
+            for item_key, flight in items:
+                root = self.insert(root, item_key, flight)
             return root
 
-        # Update the node's attributes (height and size)
-        self.update_node_attributes(root)
-
-        # Get the balance factor of this node
-        balance = self.get_balance(root)
-
-        # If the node is unbalanced and the imbalance exceeds the lazy threshold, perform rotations
-
-        # Left Left Case
-        if balance > self.rebalance_threshold and self.get_balance(root.left) >= 0:
-            return self.right_rotate(root)
-
-        # Left Right Case
-        if balance > self.rebalance_threshold and self.get_balance(root.left) < 0:
-            root.left = self.left_rotate(root.left)
-            return self.right_rotate(root)
-
-        # Right Right Case
-        if balance < -self.rebalance_threshold and self.get_balance(root.right) <= 0:
-            return self.left_rotate(root)
-
-        # Right Left Case
-        if balance < -self.rebalance_threshold and self.get_balance(root.right) > 0:
-            root.right = self.right_rotate(root.right)
-            return self.left_rotate(root)
-
-        return root
+        merged = list(heapq.merge(self.items(root), items, key=lambda item: item[0]))
+        return self.build_from_sorted(merged)
+
+    def items(self, root):
+        """ Yield the (key, flight) pairs of the tree in sorted order """
+        stack = []
+        node = root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.key, node.flight
+            node = node.right
+
+    def search(self, root, key):
+        """ Find the node with the given key, or None if it is not in the tree """
+        node = root
+        while node is not None and node.key != key:
+            node = node.left if key < node.key else node.right
+        return node
+
+    def range_query(self, root, low, high):
+        """ Yield the nodes with low <= key <= high in sorted order, skipping subtrees outside the range """
+        stack = []
+        node = root
+        while stack or node is not None:
+            # Walk left only while the keys can still be inside the range
+            while node is not None:
+                if node.key < low:
+                    node = node.right
+                else:
+                    stack.append(node)
+                    node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            if node.key > high:
+                return
+            yield node
+            node = node.right
+
+    def rank(self, root, key):
+        """ Number of keys strictly smaller than key, in O(log n) using the subtree sizes """
+        count = 0
+        node = root
+        while node is not None:
+            if node.key < key:
+                count += self.get_size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def count_range(self, root, low, high):
+        """ Number of keys with low <= key <= high, in O(log n) """
+        if low > high:
+            return 0
+        count = 0
+        node = root
+        # Number of keys <= high
+        while node is not None:
+            if node.key > high:
+                node = node.left
+            else:
+                count += self.get_size(node.left) + 1
+                node = node.right
+        return count - self.rank(root, low)
+
+    def select(self, root, index):
+        """ Return the node at the given 0-based position in sorted order, or None """
+        node = root
+        while node is not None:
+            left_size = self.get_size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node
+            else:
+                index -= left_size + 1
+                node = node.right
+        return None
 
     def in_order_traversal(self, root):
         """ In-order traversal of the AVL Tree (sorted flight based on key) """
-        if root:
-            self.in_order_traversal(root.left)
-            print(f"Flight {root.flight.flight_no}: {root.flight.origin} -> {root.flight.destination}, Departure: {root.flight.departure_time}, Price: {root.flight.price}")
-            self.in_order_traversal(root.right)
+        stack = []
+        node = root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            print(f"Flight {node.flight.flight_no}: {node.flight.origin} -> {node.flight.destination}, Departure: {node.flight.departure_time}, Price: {node.flight.price}")
+            node = node.right
+
+def main():
+    """ Demo: time inserting 500 random flights """
+    from flights import Flight
+
+    flight_tree = FlightAVLTree()
+
+    # Measure execution time for inserting the 500 flights
+    start_time = time.perf_counter()
+
+    # Create flights with flight number, departure time, origin, destination, price, and seat_number
+    flights_list = []
+    origins = ["New York", "Los Angeles", "Miami", "Houston", "San Francisco", "Austin", "Springfield", "Bloomington"]
+    destinations = ["Dallas", "New York", "Las Vegas", "San Diego", "Boston", "Chicago", "Peoria", "Providence"]
+    for i in range(1, 501):
+        flight_no = 1000 + i  # Ensure unique flight numbers
+        departure_time = f"{random.randint(0, 23):02}:{random.randint(0, 59):02}"  # Random time
+        origin = random.choice(origins)
+        destination = random.choice(destinations)
+        price = random.randint(100, 1000)               # Random price
+        seat_number = random.randint(1, 50)             # Random seat number
+        flights_list.append(Flight(flight_no, departure_time, origin, destination, price, seat_number))
+
+    # Insert flights into the AVL tree
+    for fli in flights_list:
+        flight_tree.root = flight_tree.insert(flight_tree.root, fli.flight_no, fli)
+
+    end_time = time.perf_counter()
+    execution_time = end_time - start_time
+    print(f"Execution time for inserting flights: {execution_time} seconds")
 
 # Example Usage
-flight_tree = FlightAVLTree()
-
-# Measure execution time for inserting the 500 flights
-start_time = time.perf_counter()
-
-# Create flights with flight number, departure time, origin, destination, price, and seat_number
-flights_list = []
-origins = ["New York", "Los Angeles", "Miami", "Houston", "San Francisco", "Austin", "Springfield", "Bloomington"]
-destinations = ["Dallas", "New York", "Las Vegas", "San Diego", "Boston", "Chicago", "Peoria", "Providence"]
-for i in range(1, 501):
-    flight_no = 1000 + i  # Ensure unique flight numbers
-    departure_time = f"{random.randint(0, 23):02}:{random.randint(0, 59):02}"  # Random time
-    origin = random.choice(origins)
-    destination = random.choice(destinations)
-    price = random.randint(100, 1000)               # Random price
-    seat_number = random.randint(1, 50)             # Random seat number
-    flights_list.append(Flight(flight_no, departure_time, origin, destination, price, seat_number))
-
-# Insert flights into the AVL tree
-for fli in flights_list:
-    flight_tree.root = flight_tree.insert(flight_tree.root, fli.flight_no, fli)
-
-end_time = time.perf_counter()
-execution_time = end_time - start_time
-print(f"Execution time for inserting flights: {execution_time} seconds")
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,18 @@
+""" Flight reservation system tying flights, seats and waitlists together """
 
-import flight_seats
-from flights import Flight
-from flight_collection import AVLTree
+import re
+from heapq import merge
+import metrics
+from flights import Flight, Passenger, ECONOMY_PRIORITY, BUSINESS_PRIORITY
+from flight_collection import FlightAVLTree
+from reaccommodation import ReaccommodationEngine
+
+def flight_sort_key(flight_number):
+    """ Natural ordering key for flight numbers: "AA99" < "AA100" < "UA5", and plain numbers work too.
+    The exact text breaks ties, so "AA100", "aa100" and "AA0100" get distinct keys. """
+    text = str(flight_number)
+    airline, number, rest = re.fullmatch(r"([A-Za-z]*)(\d*)(.*)", text).groups()
+    return (airline.upper(), int(number) if number else -1, rest, text)
 
 class BookingDetail:
     def __init__(self, customer_name, flight_no, destination, seat_no):
@@ -13,62 +24,270 @@ class BookingDetail:
 class FlightReservationSystem:
     # Hash Table for flight bookings
     # bookings[booking_id] = booking_details
-    def __init__(self):
-        self.root = None
-        self.flights = AVLTree()
+    def __init__(self, catalog=None, pricing=None):
+        self.flight_index = {}                  # flight_number -> Flight for O(1) lookups
+        self.flights = FlightAVLTree()          # Flights ordered by flight number for listing
         self.passenger_info = {}
+        self.catalog = catalog                  # Optional MappedFlightCatalog, its flights are loaded on first use
+        self.withdrawn = set()                  # Catalog flight numbers removed from this system
+        self.pricing = pricing                  # Optional PricingEngine, repriced on every seat or waitlist change
+        self.reaccommodation = ReaccommodationEngine()  # Alternatives by route for cancellations and overbooking
 
     # def add_airport(self, airport_code):
         # self.add_airport
 
     def add_flight(self, flight_number, departure_time, origin, destination, price, seats):
-        flight = Flight(flight_number, departure_time, origin, destination, price, seats)
-        self.flights.insert(self.root, flight_number, flight)
+        """ Create a flight and add it to the lookup index and the ordered tree """
+        # 100 and "100" are different index keys but would share a place in the tree
+        if (self.find_flight(flight_number) is not None
+                or self.flights.search(self.flights.root, flight_sort_key(flight_number)) is not None):
+            print(f"Flight {flight_number} already exists.")
+            return None
+
+        flight = self.register_flight(Flight(flight_number, departure_time, origin, destination, price, seats))
         print(f"Flight {flight_number} from {origin} to {destination} added with {seats} seats.")
+        return flight
+
+    def register_flight(self, flight):
+        """ Put a Flight into the lookup index and the ordered tree """
+        self.withdrawn.discard(flight.flight_no)
+        self.flight_index[flight.flight_no] = flight
+        self.flights.root = self.flights.insert(self.flights.root, flight_sort_key(flight.flight_no), flight)
+        self.reaccommodation.add_flight(flight)
+        self.reprice(flight)
+        return flight
+
+    def reprice(self, flight):
+        """ Refresh a flight's dynamic fare after its bookings, waitlist or cabin changed """
+        if self.pricing is not None:
+            self.pricing.update(flight)
+
+    def load_flights(self, flights):
+        """ Add a batch of Flight objects, merging them into the tree in one pass.
+        A loaded flight takes the place of a catalog flight with the same number; flights whose number is
+        already taken are skipped. Returns the number of flights added. """
+        new_flights = []
+        new_keys = set()
+        for flight in flights:
+            key = flight_sort_key(flight.flight_no)
+            if (flight.flight_no not in self.flight_index and key not in new_keys
+                    and self.flights.search(self.flights.root, key) is None):
+                self.withdrawn.discard(flight.flight_no)
+                self.flight_index[flight.flight_no] = flight
+                new_flights.append(flight)
+                new_keys.add(key)
+        self.flights.root = self.flights.bulk_merge(self.flights.root, new_flights,
+                                                    key=lambda flight: flight_sort_key(flight.flight_no))
+        for flight in new_flights:
+            self.reaccommodation.add_flight(flight)
+            self.reprice(flight)
+        return len(new_flights)
+
+    def remove_flight(self, flight_number):
+        """ Remove a flight from both structures, dropping its bookings """
+        # An unloaded catalog flight is loaded first, so it is withdrawn like any other
+        flight = self.find_flight(flight_number)
+        if flight is None:
+            print(f"Flight {flight_number} not found")
+            return None
+        del self.flight_index[flight_number]
+
+        self.flights.root = self.flights.delete(self.flights.root, flight_sort_key(flight_number))
+        self.reaccommodation.remove_flight(flight)
+        if self.catalog is not None:
+            self.withdrawn.add(flight_number)
+        if self.pricing is not None:
+            self.pricing.remove_flight(flight_number)
+        for passenger in flight.passengers.values():
+            self.passenger_info.pop(passenger.passenger_id, None)
+        if metrics.enabled:
+            # The flight's waitlist goes with it
+            metrics.WAITLISTED_PASSENGERS.dec(flight.waitlist_length())
+        return flight
 
     def find_flight(self, flight_number):
+        """ Return the flight with this number, or None. Catalog flights are loaded the first time they are found. """
+        flight = self.flight_index.get(flight_number)
+        if flight is None and self.catalog is not None and flight_number not in self.withdrawn:
+            flight = self.catalog.find(flight_number)
+            if flight is not None:
+                self.register_flight(flight)
+        return flight
+
+    def book(self, flight_number, passenger_id, seat=None, name=None, business_class=False):
+        """ Book a seat (the first free one if seat is None) without prompting; returns the seat number or None """
+        flight = self.find_flight(flight_number)
+        if flight is None:
+            print(f"Flight {flight_number} not found")
+            return None
+        if passenger_id in self.passenger_info:
+            print(f"Passenger {passenger_id} already has a reservation.")
+            return None
+
+        seats = flight.get_seat_list()
+        if seat is None:
+            seat = seats.next_free_seat()
+            if seat is None:
+                print(f"Flight {flight_number} is full.")
+                return None
+        if not seats.book_seat(seat, passenger_id):
+            return None
+
+        passenger = Passenger(name, passenger_id, BUSINESS_PRIORITY if business_class else ECONOMY_PRIORITY)
+        passenger.seat_number = seat
+        flight.passengers[passenger_id] = passenger
+        self.passenger_info[passenger_id] = BookingDetail(name, flight_number, flight.destination, seat)
+        self.reprice(flight)
+        return seat
+
+    def join_waitlist(self, flight_number, passenger_id, name=None, business_class=False):
+        """ Put a passenger on a flight's waiting list; returns False if the flight is unknown or they already wait """
+        flight = self.find_flight(flight_number)
+        if flight is None:
+            print(f"Flight {flight_number} not found")
+            return False
+
+        priority = BUSINESS_PRIORITY if business_class else ECONOMY_PRIORITY
+        if not flight.waiting_list.insert(Passenger(name, passenger_id, priority)):
+            return False
+        self.reprice(flight)
         return True
-        # return self.flights.sea(flight_number, None)
-    
-    def reserve_seat(self, seat, flight_number, passenger_id, business_class=False):
+
+    def reserve_seat(self, seat, flight_number, passenger_id, business_class=False, name=None):
+        """ Interactive reservation: offers the waitlist when full and prompts for a seat if none is given """
         flight = self.find_flight(flight_number)
         if flight is None:
             print(f"Flight {flight_number} not found")
             return
-        
-        if flight.seat_linked_list.is_seat_available():
-            waitlist_input = input("No available seats. Do you want to be on waiting list?")
-            # Add to waiting list if yes otherwise return 
+
+        if not flight.seat_linked_list.is_seat_available():
+            waitlist_input = input("No available seats. Do you want to be on waiting list? ")
+            # Add to waiting list if yes otherwise return
+            if waitlist_input.strip().lower().startswith("y"):
+                self.join_waitlist(flight_number, passenger_id, name, business_class)
             return
 
-        priority = 1 if business_class else 2
-        flight.seat_linked_list.show_available_seat()
-        while True:
-            selected_seat = input("Select which seat would you like.")
-            if flight.seat_linked_list.book_seat(selected_seat):
-                break
-        
-        self.passenger_info[passenger_id] = BookingDetail("Sujan", flight_number, flight.destination, selected_seat)
+        while seat is None:
+            print(f"Available seats: {flight.seat_linked_list.free_seats}")
+            selected_seat = input("Select which seat would you like. ")
+            if selected_seat.strip().isdigit() and not flight.seat_linked_list.is_booked(int(selected_seat)):
+                seat = int(selected_seat)
+
+        return self.book(flight_number, passenger_id, seat, name, business_class)
 
     def cancel_reservation(self, passenger_id):
+        """ Cancel a passenger's reservation and free the seat """
         if passenger_id in self.passenger_info:
             info = self.passenger_info[passenger_id]
-            seat= info.seat_no
-            flight_number = info.flight_number
+            seat = info.seat_no
+            flight_number = info.flight_no
 
             del self.passenger_info[passenger_id]
 
             flight = self.find_flight(flight_number)
             flight.seat_linked_list.cancel_seat_booking(seat)
+            flight.passengers.pop(passenger_id, None)
+
             # Check the person in waiting line next and add them in that seat
+            self.promote_waitlist(flight_number, [seat])
+            return True
+
+        print(f"Passenger {passenger_id} not found.")
+        return False
+
+    def promote_waitlist(self, flight_number, freed_seats=()):
+        """ Seat waitlisted passengers on every free seat of a flight, highest priority first """
+        flight = self.find_flight(flight_number)
+        if flight is None:
+            return []
+
+        # Passengers who got a reservation elsewhere in the meantime give up their waitlist spot
+        promoted = flight.promote_waitlist(freed_seats, skip=lambda passenger: passenger.passenger_id in self.passenger_info)
+        for passenger in promoted:
+            self.passenger_info[passenger.passenger_id] = BookingDetail(passenger.name, flight_number,
+                                                                        flight.destination, passenger.seat_number)
+        # Also covers the freed seat of a cancellation and the new seats of an aircraft change
+        self.reprice(flight)
+        return promoted
+
+    def change_aircraft(self, flight_number, seat_numbers):
+        """ Swap to a larger aircraft with seat_numbers seats and batch-promote the waitlist into the new seats """
+        flight = self.find_flight(flight_number)
+        if flight is None:
+            print(f"Flight {flight_number} not found")
+            return []
+        if seat_numbers < flight.seat_numbers:
+            print(f"Flight {flight_number} cannot shrink from {flight.seat_numbers} to {seat_numbers} seats.")
+            return []
+
+        return self.promote_waitlist(flight_number, flight.add_seats(seat_numbers))
 
-        else:
-            print(f"Passenger {passenger_id} not found.")
+    def _load_route(self, flight):
+        """ Load the catalog flights on a flight's route, since they are its reaccommodation alternatives """
+        if self.catalog is not None:
+            for index in self.catalog.on_route(flight.origin, flight.destination):
+                self.find_flight(self.catalog.flight_number(index))
+
+    def _record_reaccommodation(self, result):
+        """ Point the booking details of rebooked passengers at their new flights and reprice those flights """
+        for passenger, new_flight, seat_number in result.moved:
+            self.passenger_info[passenger.passenger_id] = BookingDetail(passenger.name, new_flight.flight_no,
+                                                                        new_flight.destination, seat_number)
+        alternatives = {new_flight.flight_no: new_flight for _, new_flight, _ in result.moved}
+        alternatives.update((waitlist_flight.flight_no, waitlist_flight) for _, waitlist_flight in result.waitlisted)
+        for alternative in alternatives.values():
+            self.reprice(alternative)
+
+    def cancel_flight(self, flight_number):
+        """ Cancel a flight and move its passengers and waitlist onto other flights on the same route """
+        flight = self.find_flight(flight_number)
+        if flight is None:
+            print(f"Flight {flight_number} not found")
+            return None
+
+        self._load_route(flight)
+        confirmed = list(flight.passengers)
+        # Waitlisted passengers who hold a reservation elsewhere keep it instead of being rebooked
+        result = self.reaccommodation.cancel_flight(
+            flight, skip=lambda passenger: passenger.passenger_id in self.passenger_info)
+        for passenger_id in confirmed:
+            self.passenger_info.pop(passenger_id, None)
+        self._record_reaccommodation(result)
+        self.remove_flight(flight_number)
+        return result
+
+    def resolve_overbooking(self, flight_number, seats_lost):
+        """ Swap to an aircraft with seats_lost fewer seats, bumping the lowest priority passengers who no longer
+        fit onto other flights on the same route """
+        flight = self.find_flight(flight_number)
+        if flight is None:
+            print(f"Flight {flight_number} not found")
+            return None
+
+        self._load_route(flight)
+        result = self.reaccommodation.resolve_overbooking(flight, seats_lost)
+        for passenger, _ in result.waitlisted:
+            self.passenger_info.pop(passenger.passenger_id, None)
+        for passenger in result.stranded:
+            self.passenger_info.pop(passenger.passenger_id, None)
+        for passenger, seat_number in result.reseated:
+            self.passenger_info[passenger.passenger_id].seat_no = seat_number
+        self._record_reaccommodation(result)
+        self.reprice(flight)
+        return result
 
     def display_flights(self):
+        """ Print every flight in flight number order """
         print("Available flights (sorted by flight number):")
-        for flight_number, flight in self.flights.items():
-            print(f"Flight {flight_number}: {flight.origin} -> {flight.destination} at {flight.departure_time}")
+        listed = ((flight.flight_no, flight.origin, flight.destination, flight.departure_time)
+                  for _, flight in self.flights.items(self.flights.root))
+        if self.catalog is not None:
+            # Loaded flights are already in the tree; the catalog supplies the rest without creating Flights
+            unloaded = (summary for summary in self.catalog.summaries()
+                        if summary[0] not in self.flight_index and summary[0] not in self.withdrawn)
+            listed = merge(listed, unloaded, key=lambda summary: flight_sort_key(summary[0]))
+        for flight_no, origin, destination, departure_time in listed:
+            print(f"Flight {flight_no}: {origin} -> {destination} at {departure_time}")
 
 # Example Usage
 if __name__ == "__main__":
@@ -80,3 +299,5 @@ if __name__ == "__main__":
     flight_system.add_flight("DL300", "10:00", "ORD", "LAX", 600, 25)
     flight_system.add_flight("AA400", "11:00", "DFW", "ATL", 300, 10)
     flight_system.add_flight("DL500", "12:00", "ATL", "JFK", 200, 5)
+
+    flight_system.display_flights()
@@ -0,0 +1,142 @@
+""" Multi-index flight catalog for fare search on top of the AVL tree """
+
+from flight_collection import FlightAVLTree
+
+class _KeyCeiling:
+    """ Sentinel that compares greater than any key component, used to close composite key ranges """
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return other is self
+
+    def __gt__(self, other):
+        return other is not self
+
+    def __ge__(self, other):
+        return True
+
+    def __eq__(self, other):
+        return other is self
+
+    def __hash__(self):
+        return id(self)
+
+KEY_CEILING = _KeyCeiling()
+
+class FlightCatalog:
+    """ Flights indexed by number, price, departure time and route for range queries """
+    def __init__(self, rebalance_threshold=2):
+        self.by_number = FlightAVLTree(rebalance_threshold)       # flight_no
+        self.by_price = FlightAVLTree(rebalance_threshold)        # (price, flight_no)
+        self.by_departure = FlightAVLTree(rebalance_threshold)    # (departure_time, flight_no)
+        self.by_route = FlightAVLTree(rebalance_threshold)        # (origin, destination, departure_time, flight_no)
+
+    @staticmethod
+    def index_keys(flight):
+        """ Secondary index keys of a flight, made unique by the flight number """
+        return ((flight.price, flight.flight_no),
+                (flight.departure_time, flight.flight_no),
+                (flight.origin, flight.destination, flight.departure_time, flight.flight_no))
+
+    def __len__(self):
+        return self.by_number.get_size(self.by_number.root)
+
+    def get(self, flight_no):
+        """ Return the flight with the given number, or None """
+        node = self.by_number.search(self.by_number.root, flight_no)
+        return node.flight if node else None
+
+    def add_flight(self, flight):
+        """ Add a flight to every index """
+        if self.get(flight.flight_no) is not None:
+            print(f"Flight {flight.flight_no} is already in the catalog.")
+            return False
+
+        price_key, departure_key, route_key = self.index_keys(flight)
+        self.by_number.root = self.by_number.insert(self.by_number.root, flight.flight_no, flight)
+        self.by_price.root = self.by_price.insert(self.by_price.root, price_key, flight)
+        self.by_departure.root = self.by_departure.insert(self.by_departure.root, departure_key, flight)
+        self.by_route.root = self.by_route.insert(self.by_route.root, route_key, flight)
+        return True
+
+    def bulk_load(self, flights):
+        """ Add a batch of flights, building or merging each index in one pass instead of one insert per flight """
+        batch = {}
+        for flight in flights:
+            if flight.flight_no not in batch and self.get(flight.flight_no) is None:
+                batch[flight.flight_no] = flight
+        flights = list(batch.values())
+
+        self.by_number.root = self.by_number.bulk_merge(self.by_number.root, flights)
+        self.by_price.root = self.by_price.bulk_merge(self.by_price.root, flights,
+                                                      key=lambda flight: self.index_keys(flight)[0])
+        self.by_departure.root = self.by_departure.bulk_merge(self.by_departure.root, flights,
+                                                              key=lambda flight: self.index_keys(flight)[1])
+        self.by_route.root = self.by_route.bulk_merge(self.by_route.root, flights,
+                                                      key=lambda flight: self.index_keys(flight)[2])
+        return len(flights)
+
+    def remove_flight(self, flight_no):
+        """ Remove a flight from every index and return it """
+        flight = self.get(flight_no)
+        if flight is None:
+            print(f"Flight {flight_no} not found.")
+            return None
+
+        price_key, departure_key, route_key = self.index_keys(flight)
+        self.by_number.root = self.by_number.delete(self.by_number.root, flight_no)
+        self.by_price.root = self.by_price.delete(self.by_price.root, price_key)
+        self.by_departure.root = self.by_departure.delete(self.by_departure.root, departure_key)
+        self.by_route.root = self.by_route.delete(self.by_route.root, route_key)
+        return flight
+
+    def flights_by_price(self, min_price, max_price):
+        """ Flights priced between min_price and max_price (inclusive), cheapest first """
+        nodes = self.by_price.range_query(self.by_price.root, (min_price,), (max_price, KEY_CEILING))
+        return [node.flight for node in nodes]
+
+    def count_by_price(self, min_price, max_price):
+        """ Number of flights priced between min_price and max_price (inclusive), in O(log n) """
+        return self.by_price.count_range(self.by_price.root, (min_price,), (max_price, KEY_CEILING))
+
+    def flights_departing(self, earliest, latest):
+        """ Flights departing between earliest and latest ("HH:MM", inclusive), in departure order """
+        nodes = self.by_departure.range_query(self.by_departure.root, (earliest,), (latest, KEY_CEILING))
+        return [node.flight for node in nodes]
+
+    def cheapest(self, offset=0, limit=10):
+        """ One page of flights in price order, found by rank selection instead of a full walk """
+        tree = self.by_price
+        first = tree.select(tree.root, offset)
+        if first is None:
+            return []
+        # Continue the in-order scan from the selected node
+        nodes = tree.range_query(tree.root, first.key, (KEY_CEILING,))
+        page = []
+        for node in nodes:
+            if len(page) == limit:
+                break
+            page.append(node.flight)
+        return page
+
+    def search(self, origin, destination, earliest="00:00", latest="23:59", max_price=None, offset=0, limit=None):
+        """ Flights on a route within a departure window and under max_price, cheapest first """
+        nodes = self.by_route.range_query(self.by_route.root,
+                                          (origin, destination, earliest),
+                                          (origin, destination, latest, KEY_CEILING))
+        if max_price is None:
+            matches = [node.flight for node in nodes]
+        else:
+            matches = [node.flight for node in nodes if node.flight.price <= max_price]
+        matches.sort(key=lambda flight: flight.price)
+
+        if limit is None:
+            return matches[offset:]
+        return matches[offset:offset + limit]
+
+    def count_route(self, origin, destination, earliest="00:00", latest="23:59"):
+        """ Number of flights on a route within a departure window, in O(log n) """
+        return self.by_route.count_range(self.by_route.root,
+                                         (origin, destination, earliest),
+                                         (origin, destination, latest, KEY_CEILING))
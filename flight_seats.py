@@ -1,30 +1,176 @@
 """ Linked lists to store the seats of the flight """
 
 import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+import metrics
 
 class SeatNode:
     """ Individual seat node which will be inserted to the linked list """
-    def __init__(self, seat_number):
+    __slots__ = ("seat_number", "passenger_id", "is_booked", "next", "prev", "position")
+
+    def __init__(self, seat_number, position=None):
         self.seat_number = seat_number
         self.passenger_id = None
         self.is_booked = False                  # All the seats are available in the beginning
         self.next = None
         self.prev = None
+        self.position = position                # Index of the seat in the list order
+
+class FreeRunIndex:
+    """ Segment tree over seat positions that finds the first run of N adjacent free seats in O(log n) """
+    def __init__(self, free_flags):
+        free_flags = list(free_flags)
+        self.size = len(free_flags)
+        self.capacity = 1
+        while self.capacity < max(self.size, 1):
+            self.capacity *= 2
+
+        # Per tree node: free run at the start, free run at the end and longest free run of its range
+        self.prefix = array("i", bytes(8 * self.capacity))
+        self.suffix = array("i", bytes(8 * self.capacity))
+        self.longest = array("i", bytes(8 * self.capacity))
+        for position, free in enumerate(free_flags):
+            leaf = self.capacity + position
+            self.prefix[leaf] = self.suffix[leaf] = self.longest[leaf] = 1 if free else 0
+        for node in range(self.capacity - 1, 0, -1):
+            self._pull(node)
+
+    def _pull(self, node):
+        """ Recompute a node from its two children """
+        left, right = 2 * node, 2 * node + 1
+        half = self.capacity >> (node.bit_length())            # Width of each child's range
+        self.prefix[node] = self.prefix[left] if self.prefix[left] < half else half + self.prefix[right]
+        self.suffix[node] = self.suffix[right] if self.suffix[right] < half else half + self.suffix[left]
+        self.longest[node] = max(self.longest[left], self.longest[right], self.suffix[left] + self.prefix[right])
+
+    def set_free(self, position, free):
+        """ Mark one seat position free or booked """
+        node = self.capacity + position
+        self.prefix[node] = self.suffix[node] = self.longest[node] = 1 if free else 0
+        node //= 2
+        while node:
+            self._pull(node)
+            node //= 2
+
+    def append(self, free):
+        """ Add a position at the end, doubling the tree when it is full """
+        if self.size == self.capacity:
+            flags = [self.longest[self.capacity + position] == 1 for position in range(self.size)]
+            self.__init__(flags + [free])
+            return
+        self.size += 1
+        self.set_free(self.size - 1, free)
+
+    def pop(self):
+        """ Drop the last position """
+        self.set_free(self.size - 1, False)
+        self.size -= 1
+
+    def find_run(self, length):
+        """ Start position of the leftmost run of at least length free seats, or -1 """
+        if length <= 0 or self.longest[1] < length:
+            return -1
+        node, start, width = 1, 0, self.capacity
+        while node < self.capacity:
+            left, right = 2 * node, 2 * node + 1
+            width //= 2
+            if self.longest[left] >= length:
+                node = left
+            elif self.suffix[left] + self.prefix[right] >= length:
+                return start + width - self.suffix[left]
+            else:
+                node, start = right, start + width
+        return start
+
+class GroupBooking:
+    """ Atomic multi-seat booking shared by the seat map classes.
+    Subclasses provide _seat_position, _seat_at, _is_booked_at, _free_flags and keep free_runs updated. """
+    def _free_run_index(self):
+        """ Free-run index, built on the first adjacent-seat search and maintained by every booking afterwards """
+        if self.free_runs is None:
+            self.free_runs = FreeRunIndex(self._free_flags())
+        return self.free_runs
+
+    def book_seats(self, seat_numbers, passenger_ids):
+        """ Book several seats all or nothing. passenger_ids is one id per seat, or a single id for all of them """
+        seat_numbers = list(seat_numbers)
+        if not isinstance(passenger_ids, (list, tuple)):
+            passenger_ids = [passenger_ids] * len(seat_numbers)
+        if len(passenger_ids) != len(seat_numbers):
+            print("Each seat needs one passenger.")
+            return False
+        if len(set(seat_numbers)) != len(seat_numbers):
+            print("The same seat was requested more than once.")
+            return False
+
+        # Check every seat before booking any of them
+        for seat_number in seat_numbers:
+            position = self._seat_position(seat_number)
+            if position is None:
+                print(f"Seat {seat_number} does not exist.")
+                return False
+            if self._is_booked_at(position):
+                if metrics.enabled:
+                    metrics.SEAT_BOOKING_CONFLICTS.inc()
+                return False
+
+        booked = []
+        try:
+            for seat_number, passenger_id in zip(seat_numbers, passenger_ids):
+                if not self.book_seat(seat_number, passenger_id):
+                    raise ValueError(f"Seat {seat_number} could not be booked.")
+                booked.append(seat_number)
+        except Exception:
+            # Roll back the seats booked so far
+            for seat_number in booked:
+                self.cancel_seat_booking(seat_number)
+            raise
+        return True
+
+    def find_adjacent_seats(self, count):
+        """ Seat numbers of the first run of count adjacent free seats in seat order, or None """
+        start = self._free_run_index().find_run(count)
+        if start == -1:
+            return None
+        return [self._seat_at(position) for position in range(start, start + count)]
+
+    def book_adjacent_seats(self, count, passenger_ids):
+        """ Book count adjacent seats all or nothing and return their seat numbers, or None """
+        seat_numbers = self.find_adjacent_seats(count)
+        if seat_numbers is None:
+            print(f"No {count} adjacent seats are available.")
+            return None
+        if not self.book_seats(seat_numbers, passenger_ids):
+            return None
+        return seat_numbers
 
 # Create a collection of seats on a flight
-class FlightSeatsList:
+class FlightSeatsList(GroupBooking):
     """ Collection of seats in a flight """
     def __init__(self, size):
-        self.head = None
-        self.tail = None
-        self.seat_map = {}                      # Dictionary to map seat numbers for quick lookup
-        for index in range(1, size + 1):
-            self.add_seat(index)
+        self.free_runs = None                   # FreeRunIndex, built on the first adjacent-seat search
+
+        # Seats 1..size are created in one pass; they are already in order, so no sorted inserts are needed
+        self.seat_order = [SeatNode(index + 1, index) for index in range(size)]   # Seat nodes by list position
+        for previous_seat, seat in zip(self.seat_order, self.seat_order[1:]):
+            previous_seat.next = seat
+            seat.prev = previous_seat
+        self.head = self.seat_order[0] if self.seat_order else None
+        self.tail = self.seat_order[-1] if self.seat_order else None
+        self.seat_map = {seat.seat_number: seat for seat in self.seat_order}     # Seat number -> node
+        self.free_seats = list(range(1, size + 1))                              # Sorted available seat numbers
+        self.available_count = size                                             # Running count of free seats
 
     def add_seat(self, seat_number):
         """ Add a new seat node to the linked list. """
-        new_seat = SeatNode(seat_number)
+        new_seat = SeatNode(seat_number, len(self.seat_order))
         self.seat_map[seat_number] = new_seat   # Add to seat map for quick lookup
+        self.seat_order.append(new_seat)
+        self._mark_free(seat_number)
+        if self.free_runs is not None:
+            self.free_runs.append(True)
         if not self.head:
             self.head = self.tail = new_seat
         else:
@@ -32,6 +178,28 @@ class FlightSeatsList:
             new_seat.prev = self.tail           # Set previous pointer to the current tail
             self.tail = new_seat                # Update the tail to the new seat
 
+    def remove_seat(self):
+        """ Remove the last seat of the linked list, which must be free """
+        seat_node = self.tail
+        if seat_node is None:
+            print("There are no seats to remove.")
+            return False
+        if seat_node.is_booked:
+            print(f"Seat {seat_node.seat_number} is booked and cannot be removed.")
+            return False
+
+        self._mark_booked(seat_node.seat_number)    # Takes the seat out of the free-seat index
+        del self.seat_map[seat_node.seat_number]
+        self.seat_order.pop()
+        if self.free_runs is not None:
+            self.free_runs.pop()
+        self.tail = seat_node.prev
+        if self.tail is None:
+            self.head = None
+        else:
+            self.tail.next = None
+        return True
+
     def book_seat(self, seat_number, passenger_id):
         """ Book a seat by changing its availability status to True """
         seat_node = self.seat_map.get(seat_number)
@@ -41,12 +209,16 @@ class FlightSeatsList:
             return False
 
         if seat_node.is_booked:
-            print(f"Seat {seat_number} is already booked.")
+            if metrics.enabled:
+                metrics.SEAT_BOOKING_CONFLICTS.inc()
             return False
 
         # Book the seat
         seat_node.is_booked = True
         seat_node.passenger_id = passenger_id
+        self._mark_booked(seat_number)
+        if self.free_runs is not None:
+            self.free_runs.set_free(seat_node.position, False)
         # print(f"Seat {seat_number} successfully booked for passenger {passenger_id}.")
         return True
 
@@ -65,6 +237,9 @@ class FlightSeatsList:
         # Cancel the booking
         seat_node.is_booked = False
         seat_node.passenger_id = None
+        self._mark_free(seat_number)
+        if self.free_runs is not None:
+            self.free_runs.set_free(seat_node.position, True)
         # print(f"Seat {seat_number} successfully canceled.")
         return True
 
@@ -79,21 +254,209 @@ class FlightSeatsList:
             print(f"Seat {current_seat.seat_number}: {status}")
             current_seat = current_seat.next
 
+    def _mark_free(self, seat_number):
+        """ Add a seat to the free-seat index """
+        insort(self.free_seats, seat_number)
+        self.available_count += 1
+
+    def _mark_booked(self, seat_number):
+        """ Remove a seat from the free-seat index """
+        del self.free_seats[bisect_left(self.free_seats, seat_number)]
+        self.available_count -= 1
+
+    def is_booked(self, seat_number):
+        """ True if the seat exists and is booked """
+        seat_node = self.seat_map.get(seat_number)
+        return seat_node is not None and seat_node.is_booked
+
+    def _seat_position(self, seat_number):
+        seat_node = self.seat_map.get(seat_number)
+        return None if seat_node is None else seat_node.position
+
+    def _seat_at(self, position):
+        return self.seat_order[position].seat_number
+
+    def _is_booked_at(self, position):
+        return self.seat_order[position].is_booked
+
+    def _free_flags(self):
+        return [not seat.is_booked for seat in self.seat_order]
+
+    def is_seat_available(self):
+        """ Check if there are any available seats in the flight """
+        return self.available_count > 0
+
+    def next_free_seat(self, after=None):
+        """ Lowest available seat number (greater than after, if given), or None """
+        index = 0 if after is None else bisect_right(self.free_seats, after)
+        return self.free_seats[index] if index < len(self.free_seats) else None
+
+    def free_seats_in_zone(self, first_seat, last_seat, limit=None):
+        """ Available seat numbers from first_seat to last_seat (a cabin zone), at most limit of them """
+        start = bisect_left(self.free_seats, first_seat)
+        end = bisect_right(self.free_seats, last_seat)
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.free_seats[start:end]
+
+class CompactFlightSeats(GroupBooking):
+    """ Array-backed seats of a flight: one byte per booked flag and one int64 per passenger id.
+    Seats are numbered 1..size and passenger ids must be integers. """
+    NO_PASSENGER = -1
+
+    def __init__(self, size):
+        self.booked = bytearray(size)                   # 1 if seat (index + 1) is booked
+        self.passenger_ids = array("q", [self.NO_PASSENGER]) * size
+        self.available_count = size
+        self.free_runs = None                           # FreeRunIndex, built on the first adjacent-seat search
+
+    def __len__(self):
+        return len(self.booked)
+
+    def _index(self, seat_number):
+        """ Array index of a seat number, or None if the seat does not exist """
+        if isinstance(seat_number, int) and 1 <= seat_number <= len(self.booked):
+            return seat_number - 1
+        return None
+
+    def add_seat(self, seat_number=None):
+        """ Add the next seat at the back of the cabin """
+        if seat_number is not None and seat_number != len(self.booked) + 1:
+            print(f"Seat {seat_number} cannot be added, the next seat is {len(self.booked) + 1}.")
+            return False
+        self.booked.append(0)
+        self.passenger_ids.append(self.NO_PASSENGER)
+        self.available_count += 1
+        if self.free_runs is not None:
+            self.free_runs.append(True)
+        return True
+
+    def remove_seat(self):
+        """ Remove the seat at the back of the cabin, which must be free """
+        if not self.booked:
+            print("There are no seats to remove.")
+            return False
+        if self.booked[-1]:
+            print(f"Seat {len(self.booked)} is booked and cannot be removed.")
+            return False
+        self.booked.pop()
+        self.passenger_ids.pop()
+        self.available_count -= 1
+        if self.free_runs is not None:
+            self.free_runs.pop()
+        return True
+
+    def _seat_position(self, seat_number):
+        return self._index(seat_number)
+
+    def _seat_at(self, position):
+        return position + 1
+
+    def _is_booked_at(self, position):
+        return self.booked[position] == 1
+
+    def _free_flags(self):
+        return [not booked for booked in self.booked]
+
+    def book_seat(self, seat_number, passenger_id):
+        """ Book a seat by changing its availability status to True """
+        index = self._index(seat_number)
+
+        if index is None:
+            print(f"Seat {seat_number} does not exist.")
+            return False
+
+        if self.booked[index]:
+            if metrics.enabled:
+                metrics.SEAT_BOOKING_CONFLICTS.inc()
+            return False
+
+        if isinstance(passenger_id, bool) or not isinstance(passenger_id, int):
+            print(f"Passenger id {passenger_id!r} is not an integer.")
+            return False
+
+        # The id is stored first, so an id too large for the array leaves the seat free
+        try:
+            self.passenger_ids[index] = passenger_id
+        except OverflowError:
+            print(f"Passenger id {passenger_id} does not fit in 64 bits.")
+            return False
+        self.booked[index] = 1
+        self.available_count -= 1
+        if self.free_runs is not None:
+            self.free_runs.set_free(index, False)
+        return True
+
+    def cancel_seat_booking(self, seat_number):
+        """ Cancel a booking by changing the seat's availability status to False """
+        index = self._index(seat_number)
+
+        if index is None:
+            print(f"Seat {seat_number} does not exist.")
+            return False
+
+        if not self.booked[index]:
+            print(f"Seat {seat_number} is already available.")
+            return False
+
+        self.booked[index] = 0
+        self.passenger_ids[index] = self.NO_PASSENGER
+        self.available_count += 1
+        if self.free_runs is not None:
+            self.free_runs.set_free(index, True)
+        return True
+
+    def is_booked(self, seat_number):
+        """ True if the seat exists and is booked """
+        index = self._index(seat_number)
+        return index is not None and self.booked[index] == 1
+
+    def passenger_of(self, seat_number):
+        """ Passenger id booked on a seat, or None """
+        index = self._index(seat_number)
+        if index is None or not self.booked[index]:
+            return None
+        return self.passenger_ids[index]
+
+    def show_seat_availability(self):
+        """ Display the availability of all seats. """
+        for index, booked in enumerate(self.booked):
+            status = "Booked" if booked else "Available"
+            print(f"Seat {index + 1}: {status}")
+
     def is_seat_available(self):
         """ Check if there are any available seats in the flight """
-        # Iterate over the seat_map for efficient checking
-        return any(not seat.is_booked for seat in self.seat_map.values())
+        return self.available_count > 0
+
+    def next_free_seat(self, after=None):
+        """ Lowest available seat number (greater than after, if given), or None """
+        index = self.booked.find(0, 0 if after is None else max(after, 0))
+        return None if index == -1 else index + 1
+
+    def free_seats_in_zone(self, first_seat, last_seat, limit=None):
+        """ Available seat numbers from first_seat to last_seat (a cabin zone), at most limit of them """
+        seats = []
+        index = self.booked.find(0, max(first_seat - 1, 0), max(last_seat, 0))
+        while index != -1 and (limit is None or len(seats) < limit):
+            seats.append(index + 1)
+            index = self.booked.find(0, index + 1, max(last_seat, 0))
+        return seats
+
 
+def main():
+    """ Demo: time creating a 1000-seat list, booking two seats and cancelling one """
+    # Measure execution time for adding, booking seats and canceling booking
+    start_time = time.perf_counter()
+    flight_seats = FlightSeatsList(1000)
 
-# Measure execution time for adding, booking seats and canceling booking
-start_time = time.perf_counter()
-flight_seats = FlightSeatsList(1000)
+    flight_seats.book_seat(300, 1401)
+    flight_seats.book_seat(500, 1402)
 
-flight_seats.book_seat(300, 1401)
-flight_seats.book_seat(500, 1402)
+    flight_seats.cancel_seat_booking(500)
 
-flight_seats.cancel_seat_booking(500)
+    end_time = time.perf_counter()
+    execution_time = end_time - start_time
+    # print(f"Total execution time: {execution_time} seconds")
 
-end_time = time.perf_counter()
-execution_time = end_time - start_time
-# print(f"Total execution time: {execution_time} seconds")
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@
 from flight_seats import FlightSeatsList
 from waitlist import MaxHeapPriorityQueue
 
+ECONOMY_PRIORITY = 1                        # Waitlist priorities, higher is served first
+BUSINESS_PRIORITY = 2
+
 class Passenger:
     """ Passenger class to store passenger details """
     def __init__(self, name, passenger_id, priority):
@@ -13,17 +16,86 @@ class Passenger:
 
 class Flight:
     """ Flight class which will be used in flight reservation system """
-    def __init__(self, flight_no, departure_time, origin, destination, price, seat_numbers = 10):
+    def __init__(self, flight_no, departure_time, origin, destination, price, seat_numbers = 10, arrival_time = None):
         self.flight_no = flight_no
         self.departure_time = departure_time
+        self.arrival_time = arrival_time        # "HH:MM", optional; itinerary search estimates it when missing
         self.destination = destination
         self.origin = origin
         self.price = price
         self.seat_numbers = seat_numbers
-        self.passengers = []
-        self.seat_linked_list = FlightSeatsList(seat_numbers)
-        self.waiting_list = MaxHeapPriorityQueue()
+        self.passengers = {}                    # passenger_id -> Passenger with a seat on this flight
+        self._seat_linked_list = None           # Seat inventory and waitlist are built on first access,
+        self._waiting_list = None               # so flights nobody books cost only their schedule fields
+
+    @property
+    def seat_linked_list(self):
+        if self._seat_linked_list is None:
+            self._seat_linked_list = FlightSeatsList(self.seat_numbers)
+        return self._seat_linked_list
+
+    @property
+    def waiting_list(self):
+        if self._waiting_list is None:
+            self._waiting_list = MaxHeapPriorityQueue()
+        return self._waiting_list
+
+    def booked_count(self):
+        """ Seats booked, without building an unbuilt seat list """
+        if self._seat_linked_list is None:
+            return 0
+        return self.seat_numbers - self._seat_linked_list.available_count
+
+    def waitlist_length(self):
+        """ Passengers waiting, without building an unbuilt waitlist """
+        return 0 if self._waiting_list is None else len(self._waiting_list)
 
     def get_seat_list(self):
         """ Return the linked list of the seats allocation """
         return self.seat_linked_list
+
+    def promote_waitlist(self, freed_seats=(), skip=None):
+        """ Seat the highest priority waitlisted passengers, freed_seats first, until seats or waitlist run out.
+        Passengers for whom skip(passenger) is true are dropped from the waitlist. Returns the promoted passengers. """
+        seats = self.seat_linked_list
+        freed_seats = list(freed_seats)
+        promoted = []
+        while seats.available_count > 0 and not self.waiting_list.is_empty():
+            passenger = self.waiting_list.extract_max()
+            if skip is not None and skip(passenger):
+                continue
+
+            seat_number = None
+            while freed_seats and seat_number is None:
+                candidate = freed_seats.pop()
+                if not seats.is_booked(candidate):
+                    seat_number = candidate
+            if seat_number is None:
+                seat_number = seats.next_free_seat()
+
+            seats.book_seat(seat_number, passenger.passenger_id)
+            passenger.seat_number = seat_number
+            self.passengers[passenger.passenger_id] = passenger
+            promoted.append(passenger)
+        return promoted
+
+    def add_seats(self, seat_numbers):
+        """ Grow the cabin to seat_numbers seats (e.g. an aircraft swap) and return the newly added seat numbers """
+        added = list(range(self.seat_numbers + 1, seat_numbers + 1))
+        if self._seat_linked_list is not None:  # An unbuilt seat list picks the new size up when it is built
+            for seat_number in added:
+                self._seat_linked_list.add_seat(seat_number)
+        self.seat_numbers = max(self.seat_numbers, seat_numbers)
+        return added
+
+    def remove_seats(self, seat_numbers):
+        """ Shrink the cabin to seat_numbers seats (e.g. a smaller aircraft) and return the removed seat numbers.
+        The removed seats, at the back of the cabin, must be free. """
+        removed = list(range(self.seat_numbers, seat_numbers, -1))
+        if self._seat_linked_list is not None:  # An unbuilt seat list picks the new size up when it is built
+            for count in range(len(removed)):
+                if not self._seat_linked_list.remove_seat():
+                    removed = removed[:count]
+                    break
+        self.seat_numbers -= len(removed)
+        return removed
@@ -0,0 +1,215 @@
+""" Multi-leg itinerary search over flight schedules with the connection scan algorithm """
+
+import heapq
+from bisect import bisect_left, bisect_right
+
+CRUISE_SPEED_MPH = 500                      # Used to estimate flight duration from route distance
+TAXI_MINUTES = 30                           # Added to every estimated flight duration
+MINUTES_PER_DAY = 24 * 60
+
+def to_minutes(clock):
+    """ Convert "HH:MM" to minutes after midnight """
+    hours, minutes = clock.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def to_clock(minutes):
+    """ Convert minutes after midnight to "HH:MM", with a +N day suffix past midnight """
+    days, minutes = divmod(int(minutes), MINUTES_PER_DAY)
+    clock = f"{minutes // 60:02}:{minutes % 60:02}"
+    return clock if days == 0 else f"{clock}+{days}"
+
+class Itinerary:
+    """ One or more flights taken in sequence from an origin to a destination """
+    def __init__(self, legs, departure, arrival):
+        self.legs = legs                    # Flights in travel order
+        self.departure = departure          # Minutes after midnight
+        self.arrival = arrival              # Minutes after midnight
+        self.price = sum(flight.price for flight in legs)
+
+    @property
+    def connections(self):
+        """ Number of connections (legs - 1) """
+        return len(self.legs) - 1
+
+    @property
+    def departure_time(self):
+        return to_clock(self.departure)
+
+    @property
+    def arrival_time(self):
+        return to_clock(self.arrival)
+
+    def __repr__(self):
+        route = " -> ".join([self.legs[0].origin] + [flight.destination for flight in self.legs])
+        flights = ", ".join(str(flight.flight_no) for flight in self.legs)
+        return f"Itinerary({route}, flights {flights}, {self.departure_time}-{self.arrival_time}, price {self.price})"
+
+class ConnectionScanPlanner:
+    """ Earliest-arrival and cheapest-fare itinerary queries in one pass over a departure-sorted connection array """
+    def __init__(self, flights=(), graph=None, min_layover=45, max_connections=2):
+        self.graph = graph                  # Optional map.Graph used to estimate missing arrival times
+        self.min_layover = min_layover      # Minutes between arriving and departing on a connection
+        self.max_connections = max_connections
+        self.connections = []               # (departure, arrival, origin, destination, price, flight), by departure
+        self.departure_times = []           # Departure minutes, parallel to connections for bisect
+        self.departures_by_origin = {}      # origin -> [(departure, flight_no, flight)] sorted by departure
+        self.distance_cache = {}
+        self.add_flights(flights)
+
+    def flight_duration(self, flight):
+        """ Flight time in minutes from the scheduled arrival, or estimated from the route distance """
+        departure = to_minutes(flight.departure_time)
+        if flight.arrival_time is not None:
+            # An arrival earlier than the departure lands the next day
+            return (to_minutes(flight.arrival_time) - departure) % MINUTES_PER_DAY
+
+        distance = self.route_distance(flight.origin, flight.destination)
+        if distance is None:
+            raise ValueError(f"Flight {flight.flight_no} has no arrival time and no route distance to estimate it.")
+        return round(distance / CRUISE_SPEED_MPH * 60) + TAXI_MINUTES
+
+    def route_distance(self, origin, destination):
+        """ Distance between two cities from the graph, or None """
+        if self.graph is None:
+            return None
+        key = (origin, destination)
+        if key not in self.distance_cache:
+            distance = self.graph.weights.get(key)
+            if distance is None and origin in self.graph.adjacency_list and destination in self.graph.adjacency_list:
+                _, distance = self.graph.dijkstra(origin, destination)
+            self.distance_cache[key] = None if distance == float('inf') else distance
+        return self.distance_cache[key]
+
+    def add_flights(self, flights):
+        """ Add flights to the schedule, re-sorting the connection array once per batch """
+        added = False
+        for flight in flights:
+            departure = to_minutes(flight.departure_time)
+            arrival = departure + self.flight_duration(flight)
+            self.connections.append((departure, arrival, flight.origin, flight.destination, flight.price, flight))
+            self.departures_by_origin.setdefault(flight.origin, []).append((departure, str(flight.flight_no), flight))
+            added = True
+
+        if added:
+            self.connections.sort(key=lambda connection: (connection[0], connection[1]))
+            self.departure_times = [connection[0] for connection in self.connections]
+            for departures in self.departures_by_origin.values():
+                departures.sort(key=lambda departure: departure[:2])
+
+    def departures(self, origin, earliest="00:00", latest="23:59"):
+        """ Flights leaving origin between earliest and latest, in departure order """
+        departures = self.departures_by_origin.get(origin, [])
+        first = bisect_left(departures, to_minutes(earliest), key=lambda departure: departure[0])
+        last = bisect_right(departures, to_minutes(latest), key=lambda departure: departure[0])
+        return [flight for _, _, flight in departures[first:last]]
+
+    def _limits(self, max_connections, min_layover):
+        max_legs = (self.max_connections if max_connections is None else max_connections) + 1
+        layover = self.min_layover if min_layover is None else min_layover
+        return max_legs, layover
+
+    @staticmethod
+    def _itinerary(label):
+        """ Rebuild the flights of a (connection, previous label) chain """
+        legs = []
+        while label is not None:
+            connection, label = label
+            legs.append(connection)
+        legs.reverse()
+        return Itinerary([connection[5] for connection in legs], legs[0][0], legs[-1][1])
+
+    def earliest_arrival(self, origin, destination, depart_after="00:00", max_connections=None, min_layover=None):
+        """ Itinerary reaching destination as early as possible, or None """
+        max_legs, layover = self._limits(max_connections, min_layover)
+
+        # ready[legs][city] = (time the traveller can board a flight there after that many legs, label)
+        ready = [dict() for _ in range(max_legs)]
+        best_arrival = float('inf')
+        best_label = None
+
+        start = bisect_left(self.departure_times, to_minutes(depart_after))
+        for index in range(start, len(self.connections)):
+            connection = self.connections[index]
+            departure, arrival, from_city, to_city = connection[:4]
+
+            # Every later connection departs after the best known arrival
+            if departure >= best_arrival:
+                break
+
+            for legs in range(max_legs):
+                if legs == 0:
+                    if from_city != origin:
+                        continue
+                    previous = None
+                else:
+                    boarding = ready[legs - 1].get(from_city)
+                    if boarding is None or boarding[0] > departure:
+                        continue
+                    previous = boarding[1]
+
+                label = (connection, previous)
+                if to_city == destination:
+                    if arrival < best_arrival:
+                        best_arrival, best_label = arrival, label
+                elif legs + 1 < max_legs:
+                    current = ready[legs].get(to_city)
+                    if current is None or arrival + layover < current[0]:
+                        ready[legs][to_city] = (arrival + layover, label)
+                # Boarding with the fewest legs is enough, more legs cannot arrive earlier
+                break
+
+        return None if best_label is None else self._itinerary(best_label)
+
+    def cheapest(self, origin, destination, depart_after="00:00", max_connections=None, min_layover=None):
+        """ Itinerary with the lowest total fare, or None """
+        max_legs, layover = self._limits(max_connections, min_layover)
+
+        # Arrivals wait in a heap until their layover ends, then become boardable at their city
+        pending = []
+        cheapest_at = [dict() for _ in range(max_legs)]     # city -> (fare, label) of boardable arrivals
+        best_fare = float('inf')
+        best_label = None
+        sequence = 0
+
+        start = bisect_left(self.departure_times, to_minutes(depart_after))
+        for index in range(start, len(self.connections)):
+            connection = self.connections[index]
+            departure, arrival, from_city, to_city, price = connection[:5]
+
+            while pending and pending[0][0] <= departure:
+                _, _, legs, city, fare, label = heapq.heappop(pending)
+                current = cheapest_at[legs].get(city)
+                if current is None or fare < current[0]:
+                    cheapest_at[legs][city] = (fare, label)
+
+            for legs in range(max_legs):
+                if legs == 0:
+                    if from_city != origin:
+                        continue
+                    fare, previous = 0, None
+                else:
+                    boarding = cheapest_at[legs - 1].get(from_city)
+                    if boarding is None:
+                        continue
+                    fare, previous = boarding
+
+                fare += price
+                if fare >= best_fare:
+                    continue
+                label = (connection, previous)
+                if to_city == destination:
+                    best_fare, best_label = fare, label
+                elif legs + 1 < max_legs and not self._dominated(cheapest_at, legs, to_city, fare):
+                    heapq.heappush(pending, (arrival + layover, sequence, legs, to_city, fare, label))
+                    sequence += 1
+
+        return None if best_label is None else self._itinerary(best_label)
+
+    @staticmethod
+    def _dominated(cheapest_at, legs, city, fare):
+        """ True if an arrival already boardable at city is no more expensive and used no more legs """
+        for fewer_legs in range(legs + 1):
+            current = cheapest_at[fewer_legs].get(city)
+            if current is not None and current[0] <= fare:
+                return True
+        return False
@@ -1,31 +1,141 @@
 """ Graph data structure to store flights """
 
 import heapq
+import math
 import time
 import random
+from collections import OrderedDict
+
+import metrics
+
+class RouteCache:
+    """ Bounded LRU cache of shortest paths, indexed by the edges each cached path uses """
+    def __init__(self, max_entries=10000, max_nodes=None):
+        self.max_entries = max_entries      # Maximum number of cached routes
+        self.max_nodes = max_nodes          # Optional bound on the total number of cities stored in cached paths
+        self.entries = OrderedDict()        # (start, end) -> (path, distance), least recently used first
+        self.edge_index = {}                # frozenset({city1, city2}) -> keys of the cached paths using that edge
+        self.cached_nodes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        return self.entries[key]
+
+    def __setitem__(self, key, route):
+        self.put(key, route)
+
+    def get(self, key):
+        """ Return the cached (path, distance) for a (start, end) key, or None, and count the hit or miss """
+        route = self.entries.get(key)
+        if route is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return route
+
+    def put(self, key, route):
+        """ Cache a (path, distance) route and evict the least recently used routes past the bounds """
+        if key in self.entries:
+            self.discard(key)
+        path = route[0]
+        self.entries[key] = route
+        self.cached_nodes += len(path)
+        for node1, node2 in zip(path, path[1:]):
+            self.edge_index.setdefault(frozenset((node1, node2)), set()).add(key)
+
+        while len(self.entries) > self.max_entries or (self.max_nodes is not None and
+                                                        self.cached_nodes > self.max_nodes and len(self.entries) > 1):
+            self.discard(next(iter(self.entries)))
+            self.evictions += 1
+
+    def discard(self, key):
+        """ Remove one cached route and its edge index entries """
+        path, _ = self.entries.pop(key)
+        self.cached_nodes -= len(path)
+        for node1, node2 in zip(path, path[1:]):
+            edge = frozenset((node1, node2))
+            keys = self.edge_index.get(edge)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.edge_index[edge]
+
+    def invalidate_edge(self, node1, node2):
+        """ Drop only the cached routes that travel over the edge between node1 and node2 """
+        keys = self.edge_index.get(frozenset((node1, node2)), ())
+        for key in list(keys):
+            self.discard(key)
+            self.invalidations += 1
+
+    def invalidate_longer_than(self, weight):
+        """ Drop the cached routes that a new edge of this weight could shorten (any route using it is at least as long) """
+        for key in [key for key, (_, distance) in self.entries.items() if distance > weight]:
+            self.discard(key)
+            self.invalidations += 1
+
+    def clear(self):
+        """ Drop every cached route """
+        self.entries.clear()
+        self.edge_index.clear()
+        self.cached_nodes = 0
+
+    def stats(self):
+        """ Hit, miss, eviction and invalidation counters """
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
 
 class Graph:
     """ Graph or Map between flights. """
-    def __init__(self):
-        self.adjacency_list = {}            # Adjacency list to store nodes and their connections
-        self.weights = {}                   # Dictionary to store weights of edges
-        self.shortest_path_cache = {}       # Cache to store results of shortest path calculations
+    def __init__(self, cache_size=10000):
+        self.adjacency_list = {}                        # Adjacency list to store nodes and their connections
+        self.weights = {}                               # Dictionary to store weights of edges
+        self.shortest_path_cache = RouteCache(cache_size)   # Cache to store results of shortest path calculations
+        self.coordinates = {}                           # Optional (latitude, longitude) of each city for A*
+        self.last_nodes_settled = 0                     # Nodes settled by the most recent point-to-point search
 
     def add_node(self, node):
         """ Add a node (city) to the graph. """
         if node not in self.adjacency_list:
             self.adjacency_list[node] = []
 
+    def set_coordinates(self, node, latitude, longitude):
+        """ Set the location of a city, used by the A* heuristic. """
+        if node in self.adjacency_list:
+            self.coordinates[node] = (latitude, longitude)
+
     def add_edge(self, node1, node2, weight=1):
         """ Add a bi-directional flight route between 2 nodes (cities) with a weight. """
         if node1 in self.adjacency_list and node2 in self.adjacency_list:
-            self.adjacency_list[node1].append(node2)
-            self.adjacency_list[node2].append(node1)
+            old_weight = self.weights.get((node1, node2))
+            if old_weight is None:
+                self.adjacency_list[node1].append(node2)
+                self.adjacency_list[node2].append(node1)
 
             # Add weights for both directions
             self.weights[(node1, node2)] = weight
             self.weights[(node2, node1)] = weight
 
+            # A heavier edge only affects the routes that use it; a new or cheaper one can shorten any longer route
+            if old_weight is not None and weight > old_weight:
+                self.shortest_path_cache.invalidate_edge(node1, node2)
+            elif old_weight is None or weight < old_weight:
+                self.shortest_path_cache.invalidate_longer_than(weight)
+
     def remove_edge(self, node1, node2):
         """ Remove Bi-directional flight route between 2 nodes or cities """
         if node1 in self.adjacency_list and node2 in self.adjacency_list:
@@ -40,8 +150,8 @@ class Graph:
         if (node2, node1) in self.weights:
             del self.weights[(node2, node1)]
 
-        # Clear cache as the structure has changed
-        self.shortest_path_cache.clear()
+        # Only the cached routes over this edge have changed
+        self.shortest_path_cache.invalidate_edge(node1, node2)
 
     def display(self):
         """ Display the graph's adjacency list and weights. """
@@ -52,6 +162,11 @@ class Graph:
         for (node1, node2), weight in self.weights.items():
             print(f"{node1} <-> {node2} : {weight}")
 
+    def compile(self):
+        """ Freeze the graph into a CompiledGraph with integer city ids and CSR adjacency arrays """
+        from compact_graph import CompiledGraph
+        return CompiledGraph.from_graph(self)
+
     def dijkstra(self, start_node, end_node):
         """ Dijkstra's algorithm to find the shortest path between two nodes based on edge weights. """
         # Priority queue to hold nodes to be explored
@@ -65,10 +180,16 @@ class Graph:
 
         # Previous node dictionary to reconstruct the path
         previous_nodes = {node: None for node in self.adjacency_list}
+        self.last_nodes_settled = 0
 
         while len(pq) != 0:
             current_distance, current_node = heapq.heappop(pq)
 
+            # Skip queue entries that a shorter path has already replaced
+            if current_distance > distances[current_node]:
+                continue
+            self.last_nodes_settled += 1
+
             # If we reach the destination node, reconstruct and return the path
             if current_node == end_node:
                 path = []
@@ -92,72 +213,363 @@ class Graph:
         # If no path is found, return None
         return None, float('inf')
 
-    def shortest_path(self, start_node, end_node):
-        """ Wrapper function to find and cache the shortest path using Dijkstra's algorithm. """
+    def bidirectional_dijkstra(self, start_node, end_node):
+        """ Dijkstra's algorithm run from both ends at once, stopping when the two frontiers meet. """
+        if start_node == end_node:
+            self.last_nodes_settled = 1
+            return [start_node], 0
+
+        # Index 0 searches forward from the start, index 1 backward from the end (routes are bi-directional)
+        distances = ({start_node: 0}, {end_node: 0})
+        previous_nodes = ({start_node: None}, {end_node: None})
+        queues = ([(0, start_node)], [(0, end_node)])
+        settled = (set(), set())
+        best_distance = float('inf')
+        meeting_node = None
+        self.last_nodes_settled = 0
+
+        while queues[0] and queues[1]:
+            # Stop once no path through the unexplored frontiers can beat the best meeting point
+            if queues[0][0][0] + queues[1][0][0] >= best_distance:
+                break
+
+            # Expand the side with the smaller frontier
+            side = 0 if len(queues[0]) <= len(queues[1]) else 1
+            current_distance, current_node = heapq.heappop(queues[side])
+            if current_node in settled[side]:
+                continue
+            settled[side].add(current_node)
+            self.last_nodes_settled += 1
+
+            for neighbor in self.adjacency_list[current_node]:
+                distance = current_distance + self.weights[(current_node, neighbor)]
+                if distance < distances[side].get(neighbor, float('inf')):
+                    distances[side][neighbor] = distance
+                    previous_nodes[side][neighbor] = current_node
+                    heapq.heappush(queues[side], (distance, neighbor))
+
+                # Check for a better path through the other search
+                other_distance = distances[1 - side].get(neighbor)
+                if other_distance is not None and distances[side][neighbor] + other_distance < best_distance:
+                    best_distance = distances[side][neighbor] + other_distance
+                    meeting_node = neighbor
+
+        if meeting_node is None:
+            return None, float('inf')
+
+        # Join the forward path to the meeting node with the backward path from it
+        path = []
+        node = meeting_node
+        while node is not None:
+            path.append(node)
+            node = previous_nodes[0][node]
+        path.reverse()
+        node = previous_nodes[1][meeting_node]
+        while node is not None:
+            path.append(node)
+            node = previous_nodes[1][node]
+        return path, best_distance
+
+    def heuristic(self, node, end_node):
+        """ Great-circle distance in miles to the end node, or 0 when either city has no coordinates. """
+        if node in self.coordinates and end_node in self.coordinates:
+            return great_circle_distance(self.coordinates[node], self.coordinates[end_node])
+        return 0
+
+    def a_star(self, start_node, end_node):
+        """ A* search guided by great-circle distance; exact as long as no route is shorter than the great circle.
+        The guide is only used when every city has coordinates; otherwise the search is plain Dijkstra. """
+        heuristic = self.heuristic
+        if len(self.coordinates) < len(self.adjacency_list):
+            # A city without coordinates would score 0 beside neighbours with a positive estimate, which makes
+            # the heuristic inconsistent, and settled cities are never reopened
+            heuristic = lambda node, end_node: 0
+        pq = [(heuristic(start_node, end_node), 0, start_node)]
+        distances = {start_node: 0}
+        previous_nodes = {start_node: None}
+        settled = set()
+        self.last_nodes_settled = 0
+
+        while pq:
+            _, current_distance, current_node = heapq.heappop(pq)
+            if current_node in settled:
+                continue
+            settled.add(current_node)
+            self.last_nodes_settled += 1
+
+            if current_node == end_node:
+                path = []
+                while current_node is not None:
+                    path.append(current_node)
+                    current_node = previous_nodes[current_node]
+                path.reverse()
+                return path, current_distance
+
+            for neighbor in self.adjacency_list[current_node]:
+                distance = current_distance + self.weights[(current_node, neighbor)]
+                if distance < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = distance
+                    previous_nodes[neighbor] = current_node
+                    heapq.heappush(pq, (distance + heuristic(neighbor, end_node), distance, neighbor))
+
+        return None, float('inf')
+
+    def single_source(self, start_node):
+        """ Dijkstra's algorithm without an end node: shortest distances and previous nodes for every reachable city """
+        pq = [(0, start_node)]
+        distances = {start_node: 0}
+        previous_nodes = {start_node: None}
+        settled = set()
+
+        while pq:
+            current_distance, current_node = heapq.heappop(pq)
+            if current_node in settled:
+                continue
+            settled.add(current_node)
+
+            for neighbor in self.adjacency_list[current_node]:
+                distance = current_distance + self.weights[(current_node, neighbor)]
+                if distance < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = distance
+                    previous_nodes[neighbor] = current_node
+                    heapq.heappush(pq, (distance, neighbor))
+
+        return distances, previous_nodes
+
+    def shortest_path_tree(self, start_node):
+        """ Shortest (path, distance) from start_node to every reachable city, built from one Dijkstra run """
+        distances, previous_nodes = self.single_source(start_node)
+
+        # Visiting cities by distance guarantees each parent's path is built before its children
+        routes = {}
+        for node in sorted(distances, key=distances.get):
+            parent = previous_nodes[node]
+            path = [node] if parent is None else routes[parent][0] + [node]
+            routes[node] = (path, distances[node])
+        del routes[start_node]
+        return routes
+
+    def precompute_routes(self, start_node):
+        """ Run Dijkstra once from start_node and cache the route to every reachable destination """
+        if start_node not in self.adjacency_list:
+            print(f"Node {start_node} does not exist in the graph.")
+            return 0
+
+        routes = self.shortest_path_tree(start_node)
+        for end_node, route in routes.items():
+            self.shortest_path_cache[(start_node, end_node)] = route
+        return len(routes)
+
+    def precompute_hubs(self, hubs, processes=None):
+        """ Precompute and cache the routes from every hub city, one Dijkstra per hub in a process pool """
+        from concurrent.futures import ProcessPoolExecutor       # Imported here so importing map stays cheap
+
+        hubs = [hub for hub in hubs if hub in self.adjacency_list]
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_route_worker,
+                                 initargs=(self.adjacency_list, self.weights)) as executor:
+            for hub, routes in zip(hubs, executor.map(_hub_routes, hubs)):
+                for end_node, route in routes.items():
+                    self.shortest_path_cache[(hub, end_node)] = route
+        return len(hubs)
+
+    def k_shortest_paths(self, start_node, end_node, k):
+        """ Up to k shortest loopless paths as (path, distance) pairs, using Yen's algorithm without changing the graph.
+        One shortest path tree towards end_node is shared by every spur search, both as a ready-made spur path
+        and as an exact A* heuristic. """
+        if start_node not in self.adjacency_list or end_node not in self.adjacency_list or k <= 0:
+            return []
+
+        # Routes are bi-directional, so the tree from end_node gives each city's distance and next hop towards it
+        distances_to_end, next_hops = self.single_source(end_node)
+        if start_node not in distances_to_end:
+            return []
+
+        found = [(self._tree_path(start_node, next_hops), distances_to_end[start_node], 0)]
+        candidates = []
+        seen = {tuple(found[0][0])}
+        sequence = 0
+
+        while len(found) < k:
+            previous_path, _, deviation = found[-1]
+            root_cost = 0
+            for index in range(len(previous_path) - 1):
+                if index >= deviation:
+                    spur_node = previous_path[index]
+                    root_path = previous_path[:index + 1]
+
+                    # Block the next hops already taken from this root and the cities on the root itself
+                    banned_edges = {path[index + 1] for path, _, _ in found if path[:index + 1] == root_path}
+                    banned_nodes = set(root_path[:-1])
+                    spur = self._spur_path(spur_node, end_node, banned_nodes, banned_edges, distances_to_end, next_hops)
+                    if spur is not None:
+                        path = root_path[:-1] + spur[0]
+                        if tuple(path) not in seen:
+                            seen.add(tuple(path))
+                            heapq.heappush(candidates, (root_cost + spur[1], sequence, path, index))
+                            sequence += 1
+                root_cost += self.weights[(previous_path[index], previous_path[index + 1])]
+
+            if not candidates:
+                break
+            distance, _, path, deviation = heapq.heappop(candidates)
+            found.append((path, distance, deviation))
+
+        return [(path, distance) for path, distance, _ in found]
+
+    @staticmethod
+    def _tree_path(node, next_hops):
+        """ Follow the next hops of a shortest path tree from node to its root """
+        path = [node]
+        while next_hops[node] is not None:
+            node = next_hops[node]
+            path.append(node)
+        return path
+
+    def _spur_path(self, spur_node, end_node, banned_nodes, banned_edges, distances_to_end, next_hops):
+        """ Shortest path from spur_node to end_node avoiding banned cities and banned first hops, or None """
+        # The unrestricted tree path is optimal whenever it avoids everything that is banned
+        tree_path = self._tree_path(spur_node, next_hops)
+        if (len(tree_path) < 2 or tree_path[1] not in banned_edges) and banned_nodes.isdisjoint(tree_path):
+            return tree_path, distances_to_end[spur_node]
+
+        # Otherwise A* with the unrestricted distances as a heuristic, which blocking can only make longer
+        pq = [(distances_to_end[spur_node], 0, spur_node)]
+        distances = {spur_node: 0}
+        previous_nodes = {spur_node: None}
+        settled = set()
+        while pq:
+            _, current_distance, current_node = heapq.heappop(pq)
+            if current_node in settled:
+                continue
+            settled.add(current_node)
+
+            if current_node == end_node:
+                path = self._tree_path(end_node, previous_nodes)
+                path.reverse()
+                return path, current_distance
+
+            for neighbor in self.adjacency_list[current_node]:
+                if neighbor in banned_nodes or neighbor not in distances_to_end:
+                    continue
+                if current_node == spur_node and neighbor in banned_edges:
+                    continue
+                distance = current_distance + self.weights[(current_node, neighbor)]
+                if distance < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = distance
+                    previous_nodes[neighbor] = current_node
+                    heapq.heappush(pq, (distance + distances_to_end[neighbor], distance, neighbor))
+
+        return None
+
+    def shortest_path(self, start_node, end_node, strategy="dijkstra"):
+        """ Wrapper function to find and cache the shortest path using Dijkstra's algorithm.
+        strategy selects "dijkstra", "bidirectional" or "astar" for the search.
+        Returns (path, distance), or None when there is no path. """
+        searches = {"dijkstra": self.dijkstra, "bidirectional": self.bidirectional_dijkstra, "astar": self.a_star}
+        if strategy not in searches:
+            raise ValueError(f"Unknown routing strategy {strategy}, expected one of {sorted(searches)}")
+
         # Check if the path is already cached
-        if (start_node, end_node) in self.shortest_path_cache:
-            print(f"Using cached result for shortest path between {start_node} and {end_node}")
-            print(f"Shortest path between {start_node} and {end_node}: "
-                  f"{' -> '.join(self.shortest_path_cache[(start_node, end_node)][0])} "
-                  f"with total distance {self.shortest_path_cache[(start_node, end_node)][1]}")
-            return self.shortest_path_cache[(start_node, end_node)]
+        cached = self.shortest_path_cache.get((start_node, end_node))
+        if cached is not None:
+            if metrics.enabled:
+                metrics.ROUTE_CACHE_HITS.inc()
+            return cached
 
         # Validate nodes
         if start_node not in self.adjacency_list or end_node not in self.adjacency_list:
             print(f"One of the nodes {start_node} or {end_node} does not exist in the graph.")
             return None
 
-        # Calculate the shortest path using Dijkstra's algorithm
-        path, distance = self.dijkstra(start_node, end_node)
-
-        # Cache the result
-        if path:
-            self.shortest_path_cache[(start_node, end_node)] = (path, distance)
-            print(f"Cached the result for shortest path between {start_node} and {end_node}")
+        # Calculate the shortest path with the selected search
+        timed = metrics.enabled                 # Read once, in case the flag is switched during the search
+        if timed:
+            start_time = time.perf_counter()
+        path, distance = searches[strategy](start_node, end_node)
+        if timed:
+            metrics.ROUTE_QUERY_SECONDS.observe(time.perf_counter() - start_time)
+            metrics.ROUTE_CACHE_MISSES.inc()
+            metrics.ROUTE_NODES_SETTLED.observe(self.last_nodes_settled)
 
-        # Display and return the result
-        if path:
-            print(f"Shortest path between {start_node} and {end_node}: {' -> '.join(path)} with total distance {distance}")
-            return path
-        else:
-            print(f"No path found between {start_node} and {end_node}.")
+        # Cache and return the result
+        if not path:
             return None
+        self.shortest_path_cache[(start_node, end_node)] = (path, distance)
+        return path, distance
+
+EARTH_RADIUS_MILES = 3958.8
+
+def great_circle_distance(coordinates1, coordinates2):
+    """ Haversine distance in miles between two (latitude, longitude) points in degrees """
+    latitude1, longitude1 = map(math.radians, coordinates1)
+    latitude2, longitude2 = map(math.radians, coordinates2)
+    a = (math.sin((latitude2 - latitude1) / 2) ** 2 +
+         math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+_worker_graph = None
+
+def _init_route_worker(adjacency_list, weights):
+    """ Process pool initializer: rebuild the graph once per worker instead of once per hub """
+    global _worker_graph
+    _worker_graph = Graph()
+    _worker_graph.adjacency_list = adjacency_list
+    _worker_graph.weights = weights
+
+def _hub_routes(hub):
+    """ Process pool task: the shortest path tree from one hub """
+    return _worker_graph.shortest_path_tree(hub)
 
 def generate_cities(no_cities):
     """ Generate random city names """
     return [f"City_{i}" for i in range(no_cities)]
 
-# Create the graph
-graph = Graph()
+def print_route(start_node, end_node, route):
+    """ Print a (path, distance) result of shortest_path """
+    if route is None:
+        print(f"No path found between {start_node} and {end_node}.")
+    else:
+        print(f"Shortest path between {start_node} and {end_node}: {' -> '.join(route[0])} "
+              f"with total distance {route[1]}")
+
+def main():
+    """ Demo: shortest path on a random 500-city network, then again from the route cache """
+    # Create the graph
+    graph = Graph()
+
+    # Add 500 cities (nodes)
+    num_cities = 500
+    cities = generate_cities(num_cities)
 
-# Add 500 cities (nodes)
-num_cities = 500
-cities = generate_cities(num_cities)
+    for city in cities:
+        graph.add_node(city)
 
-for city in cities:
-    graph.add_node(city)
+    # Add random edges with weights (distances)
+    num_edges = random.randint(num_cities, num_cities * 2)
 
-# Add random edges with weights (distances)
-num_edges = random.randint(num_cities, num_cities * 2)
+    for _ in range(num_edges):
+        city1, city2 = random.sample(cities, 2)  # Ensure we have two different cities
+        weight = random.randint(100, 3000)  # Random distance between 100 and 3000 miles
+        graph.add_edge(city1, city2, weight)
 
-for _ in range(num_edges):
-    city1, city2 = random.sample(cities, 2)  # Ensure we have two different cities
-    weight = random.randint(100, 3000)  # Random distance between 100 and 3000 miles
-    graph.add_edge(city1, city2, weight)
+    # Display the graph
+    # graph.display()
 
-# Display the graph
-# graph.display()
+    # Measure execution time for finding the shortest path
+    start_time = time.perf_counter_ns()
+    shortest_path = graph.shortest_path('City_0', 'City_400')
+    end_time = time.perf_counter_ns()
+    execution_time = end_time - start_time
+    print_route('City_0', 'City_400', shortest_path)
+    print(f"Execution time first time: {execution_time} nano seconds")
 
-# Measure execution time for finding the shortest path
-start_time = time.perf_counter_ns()
-shortest_path = graph.shortest_path('City_0', 'City_400')
-end_time = time.perf_counter_ns()
-execution_time = end_time - start_time
-print(f"Execution time first time: {execution_time} nano seconds")
+    # Find and display the shortest path again to demonstrate caching
+    start_time = time.perf_counter_ns()
+    shortest_path = graph.shortest_path('City_0', 'City_400')  # This should use the cached result
+    end_time = time.perf_counter_ns()
+    execution_time = end_time - start_time
+    print_route('City_0', 'City_400', shortest_path)
+    print(f"Execution time after getting from cache: {execution_time} nano seconds")
 
-# Find and display the shortest path again to demonstrate caching
-start_time = time.perf_counter_ns()
-shortest_path = graph.shortest_path('City_0', 'City_400')  # This should use the cached result
-end_time = time.perf_counter_ns()
-execution_time = end_time - start_time
-print(f"Execution time after getting from cache: {execution_time} nano seconds")
+if __name__ == "__main__":
+    main()
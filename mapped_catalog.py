@@ -0,0 +1,204 @@
+""" Immutable on-disk columnar flight catalog that worker processes memory-map and share without copying """
+
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+from flights import Flight
+from flight_reservation_system import flight_sort_key
+from itinerary import to_minutes, to_clock
+
+CATALOG_MAGIC = b"FRSCAT02"
+NO_ARRIVAL = -1                             # Arrival column value for flights without a scheduled arrival
+
+# Column name, array typecode; the file stores them in this order after the header
+COLUMNS = (
+    ("number_offsets", "q"),                # Flight number i is number_bytes[number_offsets[i]:number_offsets[i + 1]]
+    ("number_bytes", "B"),
+    ("number_is_int", "b"),                 # 1 if the flight number was an int rather than a string
+    ("departure", "h"),                     # Minutes after midnight
+    ("arrival", "h"),                       # Minutes after midnight, or NO_ARRIVAL
+    ("origin", "i"),                        # City ids
+    ("destination", "i"),
+    ("price", "d"),
+    ("capacity", "i"),
+    ("route_order", "q"),                   # Rows sorted by (origin, destination), so a route is one contiguous range
+    ("city_offsets", "q"),                  # City i is city_bytes[city_offsets[i]:city_offsets[i + 1]]
+    ("city_bytes", "B"),
+)
+# Arrays are written in native byte order: a catalog is built on the machine (or architecture) that serves it
+HEADER = struct.Struct("=qq" + "q" * len(COLUMNS))      # flight count, city count, column offsets
+
+def _strings(values):
+    """ Offsets and UTF-8 bytes of a string table """
+    offsets = array("q", [0])
+    data = bytearray()
+    for value in values:
+        data += str(value).encode()
+        offsets.append(len(data))
+    return offsets, array("B", data)
+
+def write_catalog(path, flights):
+    """ Write flights as a sorted columnar catalog, atomically replacing path; returns the number written """
+    flights = sorted(flights, key=lambda flight: flight_sort_key(flight.flight_no))
+    city_ids = {}
+    for flight in flights:
+        city_ids.setdefault(flight.origin, len(city_ids))
+        city_ids.setdefault(flight.destination, len(city_ids))
+
+    number_offsets, number_bytes = _strings(flight.flight_no for flight in flights)
+    city_offsets, city_bytes = _strings(city_ids)
+    columns = {
+        "number_offsets": number_offsets,
+        "number_bytes": number_bytes,
+        "number_is_int": array("b", [isinstance(flight.flight_no, int) for flight in flights]),
+        "departure": array("h", [to_minutes(flight.departure_time) for flight in flights]),
+        "arrival": array("h", [NO_ARRIVAL if flight.arrival_time is None else to_minutes(flight.arrival_time)
+                               for flight in flights]),
+        "origin": array("i", [city_ids[flight.origin] for flight in flights]),
+        "destination": array("i", [city_ids[flight.destination] for flight in flights]),
+        "price": array("d", [flight.price for flight in flights]),
+        "capacity": array("i", [flight.seat_numbers for flight in flights]),
+        "route_order": array("q", sorted(range(len(flights)), key=lambda index: (
+            city_ids[flights[index].origin], city_ids[flights[index].destination], index))),
+        "city_offsets": city_offsets,
+        "city_bytes": city_bytes,
+    }
+
+    # Every column starts on an 8-byte boundary so the mapped views are aligned
+    offsets = []
+    position = len(CATALOG_MAGIC) + HEADER.size
+    for name, _ in COLUMNS:
+        position += -position % 8
+        offsets.append(position)
+        position += len(columns[name]) * columns[name].itemsize
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as catalog_file:
+        catalog_file.write(CATALOG_MAGIC)
+        catalog_file.write(HEADER.pack(len(flights), len(city_ids), *offsets))
+        for (name, _), offset in zip(COLUMNS, offsets):
+            catalog_file.write(bytes(offset - catalog_file.tell()))
+            columns[name].tofile(catalog_file)
+        catalog_file.flush()
+        os.fsync(catalog_file.fileno())
+    os.replace(temporary_path, path)
+    return len(flights)
+
+class MappedFlightCatalog:
+    """ Read-only view of a catalog file. Opening it maps the file and reads only the header, so startup
+    time does not depend on the catalog size; Flight objects are created the first time they are asked for. """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as catalog_file:
+            self.map = mmap.mmap(catalog_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(CATALOG_MAGIC)] != CATALOG_MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not a flight catalog.")
+
+        self.count, self.city_count, *offsets = HEADER.unpack_from(self.map, len(CATALOG_MAGIC))
+        self.view = memoryview(self.map)
+        self.columns = {}
+        for (name, typecode), offset in zip(COLUMNS, offsets):
+            length = self._column_length(name)
+            self.columns[name] = self.view[offset:offset + length * struct.calcsize(typecode)].cast(typecode)
+        self.materialized = {}              # Row index -> Flight created from it
+        self.cities = {}                    # City id -> decoded name
+        # City tables are small next to the flight columns, so route lookups get their name -> id map up front
+        self.city_ids = {self.city(city_id): city_id for city_id in range(self.city_count)}
+
+    def _column_length(self, name):
+        """ Number of values in a column; string tables need their offsets column read first """
+        if name == "number_offsets":
+            return self.count + 1
+        if name == "city_offsets":
+            return self.city_count + 1
+        if name == "number_bytes":
+            return self.columns["number_offsets"][self.count]
+        if name == "city_bytes":
+            return self.columns["city_offsets"][self.city_count]
+        return self.count
+
+    def __len__(self):
+        return self.count
+
+    def flight_number(self, index):
+        """ Flight number stored in a row """
+        offsets = self.columns["number_offsets"]
+        number = bytes(self.columns["number_bytes"][offsets[index]:offsets[index + 1]]).decode()
+        return int(number) if self.columns["number_is_int"][index] else number
+
+    def city(self, city_id):
+        """ City name for an id """
+        if city_id not in self.cities:
+            offsets = self.columns["city_offsets"]
+            self.cities[city_id] = bytes(self.columns["city_bytes"][offsets[city_id]:offsets[city_id + 1]]).decode()
+        return self.cities[city_id]
+
+    def index_of(self, flight_number):
+        """ Row of a flight number by binary search over the sorted rows, or None """
+        key = flight_sort_key(flight_number)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if flight_sort_key(self.flight_number(middle)) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self.flight_number(low) == flight_number:
+            return low
+        return None
+
+    def record(self, index):
+        """ (flight_no, departure_time, origin, destination, price, capacity, arrival_time) of a row """
+        columns = self.columns
+        arrival = columns["arrival"][index]
+        price = columns["price"][index]
+        return (self.flight_number(index), to_clock(columns["departure"][index]),
+                self.city(columns["origin"][index]), self.city(columns["destination"][index]),
+                int(price) if price.is_integer() else price, columns["capacity"][index],
+                None if arrival == NO_ARRIVAL else to_clock(arrival))
+
+    def flight(self, index):
+        """ The Flight of a row, created on first access; its seats and waitlist are built lazily too """
+        flight = self.materialized.get(index)
+        if flight is None:
+            flight_no, departure_time, origin, destination, price, capacity, arrival_time = self.record(index)
+            flight = Flight(flight_no, departure_time, origin, destination, price, capacity, arrival_time)
+            self.materialized[index] = flight
+        return flight
+
+    def find(self, flight_number):
+        """ The Flight with this number, or None """
+        index = self.index_of(flight_number)
+        return None if index is None else self.flight(index)
+
+    def summaries(self):
+        """ Yield (flight_no, origin, destination, departure_time) in flight number order without creating Flights """
+        columns = self.columns
+        for index in range(self.count):
+            yield (self.flight_number(index), self.city(columns["origin"][index]),
+                   self.city(columns["destination"][index]), to_clock(columns["departure"][index]))
+
+    def on_route(self, origin, destination):
+        """ Row indexes of the flights from origin to destination, found by binary search over the route order """
+        origin_id, destination_id = self.city_ids.get(origin), self.city_ids.get(destination)
+        if origin_id is None or destination_id is None:
+            return []
+        order, origins, destinations = self.columns["route_order"], self.columns["origin"], self.columns["destination"]
+
+        def route(position):
+            return origins[order[position]], destinations[order[position]]
+
+        first = bisect_left(range(self.count), (origin_id, destination_id), key=route)
+        last = bisect_right(range(self.count), (origin_id, destination_id), lo=first, key=route)
+        return order[first:last].tolist()
+
+    def close(self):
+        """ Release the mapping; Flights already created stay usable """
+        for column in self.columns.values():
+            column.release()
+        self.view.release()
+        self.map.close()
@@ -0,0 +1,125 @@
+""" Low-overhead counters, gauges and histograms for the hot paths, exported as a dict or Prometheus text """
+
+from bisect import bisect_left
+
+# Hot paths check this flag before touching any metric, so disabled metrics cost one attribute lookup
+enabled = True
+
+LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+SIZE_BUCKETS = tuple(4 ** power for power in range(11))         # 1, 4, 16, ... 1048576
+
+REGISTRY = {}                               # name -> metric, in registration order
+
+def enable():
+    """ Start recording metrics on the hot paths """
+    global enabled
+    enabled = True
+
+def disable():
+    """ Stop recording metrics; the recorded values are kept until reset() """
+    global enabled
+    enabled = False
+
+class Counter:
+    """ Monotonically increasing count. Updates are not locked: under threads a few increments may be lost,
+    which is the price of keeping them cheap. """
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        REGISTRY[name] = self
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def reset(self):
+        self.value = 0
+
+    def snapshot(self):
+        return self.value
+
+    def prometheus_lines(self):
+        return [f"{self.name} {self.value}"]
+
+class Gauge(Counter):
+    """ Value that goes up and down """
+    kind = "gauge"
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+class Histogram:
+    """ Observations counted into fixed upper-bound buckets, plus their count and sum """
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)     # The last slot counts observations above every bound
+        self.count = 0
+        self.sum = 0
+        REGISTRY[name] = self
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def reset(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+    def prometheus_lines(self):
+        snapshot = self.snapshot()
+        lines = [f'{self.name}_bucket{{le="{bound}"}} {count}' for bound, count in snapshot["buckets"].items()]
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+def snapshot():
+    """ Current value of every metric as a plain dict """
+    return {name: metric.snapshot() for name, metric in REGISTRY.items()}
+
+def prometheus_text():
+    """ Every metric in the Prometheus text exposition format """
+    lines = []
+    for name, metric in REGISTRY.items():
+        lines.append(f"# HELP {name} {metric.help_text}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        lines.extend(metric.prometheus_lines())
+    return "\n".join(lines) + "\n"
+
+def reset():
+    """ Zero every metric, e.g. between benchmark runs """
+    for metric in REGISTRY.values():
+        metric.reset()
+
+# Route queries (map.Graph.shortest_path)
+ROUTE_CACHE_HITS = Counter("route_cache_hits_total", "Route queries answered from the route cache")
+ROUTE_CACHE_MISSES = Counter("route_cache_misses_total", "Route queries that ran a search")
+ROUTE_QUERY_SECONDS = Histogram("route_query_seconds", "Latency of route searches on a cache miss", LATENCY_BUCKETS)
+ROUTE_NODES_SETTLED = Histogram("route_nodes_settled", "Nodes settled by each route search", SIZE_BUCKETS)
+
+# AVL tree (flight_collection.FlightAVLTree)
+AVL_ROTATIONS = Counter("avl_rotations_total", "Single rotations performed while rebalancing")
+AVL_PATH_LENGTH = Histogram("avl_path_length", "Nodes visited from the root by each insert or delete",
+                            tuple(range(2, 65, 2)))
+
+# Seat booking (flight_seats)
+# Only the refusal path is counted, so successful bookings pay nothing for metrics
+SEAT_BOOKING_CONFLICTS = Counter("seat_booking_conflicts_total", "Bookings refused because the seat was already booked")
+
+# Waitlists (waitlist.MaxHeapPriorityQueue)
+WAITLISTED_PASSENGERS = Gauge("waitlisted_passengers", "Passengers added to waitlists minus those taken off")
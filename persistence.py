@@ -0,0 +1,236 @@
+""" Durable reservation state: an append-only log of reservation events plus compact binary snapshots """
+
+import marshal
+import os
+import struct
+import threading
+
+from flights import Flight, Passenger
+from flight_reservation_system import FlightReservationSystem, BookingDetail
+
+SNAPSHOT_MAGIC = b"FRSSNAP1"
+FRAME_HEADER = struct.Struct("<I")          # Length of each marshalled log record
+
+class WriteAheadLog:
+    """ Append-only log of event tuples. Every event is flushed to the operating system as it is written, so it
+    survives a process crash; the fsync that makes it survive a power loss is batched instead of run per event. """
+    def __init__(self, path, batch_size=1000, sync_interval=0.05):
+        self.path = path
+        self.batch_size = batch_size            # fsync after this many unsynced events ...
+        self.sync_interval = sync_interval      # ... and at least this often in seconds while any are unsynced
+        self.file = open(path, "ab")
+        self.pending = 0
+        self.lock = threading.Lock()            # Appends and the background sync share the file
+        self.closed = threading.Event()
+        self.syncer = None
+        if sync_interval:
+            # Syncs on a timer, so the last batch before traffic goes idle is not left unsynced
+            self.syncer = threading.Thread(target=self._sync_periodically, daemon=True)
+            self.syncer.start()
+
+    def _sync_periodically(self):
+        while not self.closed.wait(self.sync_interval):
+            self.sync()
+
+    def append(self, record):
+        """ Write one event; it is durable once the batch it belongs to is synced """
+        payload = marshal.dumps(record)
+        with self.lock:
+            self.file.write(FRAME_HEADER.pack(len(payload)))
+            self.file.write(payload)
+            self.file.flush()
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self._sync()
+
+    def _sync(self):
+        if self.pending:
+            os.fsync(self.file.fileno())
+            self.pending = 0
+
+    def sync(self):
+        """ Flush buffered events to disk """
+        with self.lock:
+            if not self.file.closed:
+                self._sync()
+
+    def close(self):
+        self.closed.set()
+        if self.syncer is not None:
+            self.syncer.join()
+        with self.lock:
+            self._sync()
+            self.file.close()
+
+    @staticmethod
+    def replay(path):
+        """ Read the events of a log in order, stopping at a torn record left by a crash.
+        Returns (events, length of the intact prefix), so the torn tail can be cut off before appending. """
+        if not os.path.exists(path):
+            return [], 0
+        with open(path, "rb") as log_file:
+            data = log_file.read()
+        records = []
+        offset = 0
+        while offset + FRAME_HEADER.size <= len(data):
+            (length,) = FRAME_HEADER.unpack_from(data, offset)
+            start = offset + FRAME_HEADER.size
+            if start + length > len(data):
+                break
+            try:
+                records.append(marshal.loads(data[start:start + length]))
+            except (ValueError, EOFError, TypeError):
+                break
+            offset = start + length
+        return records, offset
+
+def write_snapshot(system, path, log_generation):
+    """ Write the whole reservation state as one marshalled, columnar binary file, atomically replacing path """
+    flights = []
+    for flight in system.flight_index.values():
+        passengers = list(flight.passengers.values())
+        waitlist = sorted(flight.waiting_list.heap, key=lambda entry: entry[0][1])      # Arrival order
+        flights.append((
+            flight.flight_no, flight.departure_time, flight.origin, flight.destination, flight.price,
+            flight.seat_numbers, flight.arrival_time,
+            [passenger.passenger_id for passenger in passengers],
+            [passenger.name for passenger in passengers],
+            [passenger.priority for passenger in passengers],
+            [passenger.seat_number for passenger in passengers],
+            [entry[1].passenger_id for entry in waitlist],
+            [entry[1].name for entry in waitlist],
+            [entry[1].priority for entry in waitlist],
+        ))
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as snapshot_file:
+        snapshot_file.write(SNAPSHOT_MAGIC)
+        marshal.dump((log_generation, flights), snapshot_file)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temporary_path, path)
+
+def read_snapshot(path, system):
+    """ Load a snapshot into an empty system and return the log generation to replay from """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as snapshot_file:
+        if snapshot_file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a reservation snapshot.")
+        log_generation, flights = marshal.load(snapshot_file)
+
+    restored = []
+    for (flight_no, departure_time, origin, destination, price, seat_numbers, arrival_time,
+         passenger_ids, names, priorities, seat_numbers_booked,
+         waitlist_ids, waitlist_names, waitlist_priorities) in flights:
+        flight = Flight(flight_no, departure_time, origin, destination, price, seat_numbers, arrival_time)
+        seats = flight.get_seat_list()
+        for passenger_id, name, priority, seat_number in zip(passenger_ids, names, priorities, seat_numbers_booked):
+            seats.book_seat(seat_number, passenger_id)
+            passenger = Passenger(name, passenger_id, priority)
+            passenger.seat_number = seat_number
+            flight.passengers[passenger_id] = passenger
+            system.passenger_info[passenger_id] = BookingDetail(name, flight_no, destination, seat_number)
+        flight.waiting_list.bulk_load(Passenger(name, passenger_id, priority) for passenger_id, name, priority
+                                      in zip(waitlist_ids, waitlist_names, waitlist_priorities))
+        restored.append(flight)
+
+    system.load_flights(restored)
+    return log_generation
+
+class PersistentReservationSystem:
+    """ FlightReservationSystem whose changes are logged and can be recovered after a restart.
+    Each operation is applied first and logged only if it succeeded, so replaying the log never fails. """
+    SNAPSHOT_FILE = "snapshot.bin"
+
+    def __init__(self, directory, batch_size=1000, sync_interval=0.05):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        os.makedirs(directory, exist_ok=True)
+        self.system = FlightReservationSystem()
+        self.generation = self.recover()
+        self.log = WriteAheadLog(self.log_path(self.generation), batch_size, sync_interval)
+
+    # Read-only views of the wrapped system, so this can stand in for a FlightReservationSystem
+
+    @property
+    def flight_index(self):
+        return self.system.flight_index
+
+    @property
+    def passenger_info(self):
+        return self.system.passenger_info
+
+    def find_flight(self, flight_number):
+        return self.system.find_flight(flight_number)
+
+    def log_path(self, generation):
+        return os.path.join(self.directory, f"wal.{generation}")
+
+    def recover(self):
+        """ Load the latest snapshot, then replay every log written since it; returns the current generation """
+        generation = read_snapshot(os.path.join(self.directory, self.SNAPSHOT_FILE), self.system)
+        while os.path.exists(self.log_path(generation)):
+            records, intact_length = WriteAheadLog.replay(self.log_path(generation))
+            for record in records:
+                self.apply(record)
+            # New events are appended to this log, so they must not land behind a torn record
+            if intact_length < os.path.getsize(self.log_path(generation)):
+                os.truncate(self.log_path(generation), intact_length)
+            if not os.path.exists(self.log_path(generation + 1)):
+                break
+            generation += 1
+        return generation
+
+    def apply(self, record):
+        """ Re-run one logged event """
+        event, arguments = record[0], record[1:]
+        if event == "add_flight":
+            flight_no, departure_time, origin, destination, price, seats = arguments
+            self.system.load_flights([Flight(flight_no, departure_time, origin, destination, price, seats)])
+        elif event == "book":
+            self.system.book(*arguments)
+        elif event == "waitlist":
+            self.system.join_waitlist(*arguments)
+        elif event == "cancel":
+            self.system.cancel_reservation(*arguments)
+
+    def add_flight(self, flight_number, departure_time, origin, destination, price, seats):
+        flight = self.system.add_flight(flight_number, departure_time, origin, destination, price, seats)
+        if flight is not None:
+            self.log.append(("add_flight", flight_number, departure_time, origin, destination, price, seats))
+        return flight
+
+    def book(self, flight_number, passenger_id, seat=None, name=None, business_class=False):
+        seat = self.system.book(flight_number, passenger_id, seat, name, business_class)
+        if seat is not None:
+            self.log.append(("book", flight_number, passenger_id, seat, name, business_class))
+        return seat
+
+    def join_waitlist(self, flight_number, passenger_id, name=None, business_class=False):
+        joined = self.system.join_waitlist(flight_number, passenger_id, name, business_class)
+        if joined:
+            self.log.append(("waitlist", flight_number, passenger_id, name, business_class))
+        return joined
+
+    def cancel_reservation(self, passenger_id):
+        cancelled = self.system.cancel_reservation(passenger_id)
+        if cancelled:
+            self.log.append(("cancel", passenger_id))
+        return cancelled
+
+    def checkpoint(self):
+        """ Write a snapshot and start a new log, so recovery only replays events after it """
+        self.log.close()
+        self.generation += 1
+        self.log = WriteAheadLog(self.log_path(self.generation), self.batch_size, self.sync_interval)
+        write_snapshot(self.system, os.path.join(self.directory, self.SNAPSHOT_FILE), self.generation)
+
+        # Older logs are covered by the snapshot now
+        for generation in range(self.generation):
+            if os.path.exists(self.log_path(generation)):
+                os.remove(self.log_path(generation))
+
+    def close(self):
+        self.log.close()
@@ -0,0 +1,184 @@
+""" Dynamic fares from load factor, waitlist depth and time to departure, kept in a price-ordered bucket index """
+
+from array import array
+from bisect import bisect_left, insort
+
+from itinerary import to_minutes, MINUTES_PER_DAY
+
+try:
+    import numpy as np
+except ImportError:                         # NumPy is optional, bulk repricing falls back to a Python loop
+    np = None
+
+class PricingEngine:
+    """ Current fare of every flight. The inputs to the fare live in parallel array columns, one row per flight,
+    so a booking event reprices one row in O(1) and a clock change reprices every row in one vectorized pass.
+
+    fare = base price * (1 + load_weight * load factor ** 2
+                           + waitlist_weight * min(waitlist / seats, 1)
+                           + urgency_weight * max(0, 1 - minutes to departure / urgency_window))
+
+    Fares are indexed by bucket (fare // bucket_size): a change within a bucket touches no index at all,
+    and a change across buckets moves the flight between two sets instead of deleting and reinserting it
+    in a tree. """
+    def __init__(self, flights=(), now="00:00", bucket_size=10, load_weight=1.0, waitlist_weight=0.5,
+                 urgency_weight=0.5, urgency_window=360):
+        self.now = to_minutes(now)
+        self.bucket_size = bucket_size
+        self.load_weight = load_weight
+        self.waitlist_weight = waitlist_weight
+        self.urgency_weight = urgency_weight
+        self.urgency_window = urgency_window    # Minutes before departure over which the urgency markup grows
+
+        self.rows = {}                          # flight_no -> row in the columns below
+        self.flight_numbers = []                # row -> flight_no, None once the flight is removed
+        self.base = array("d")                  # Base (static) price
+        self.seats = array("d")
+        self.booked = array("d")
+        self.waitlist = array("d")
+        self.departure = array("d")             # Minutes after midnight
+        self.fares = array("d")
+        self.fare_buckets = array("q")          # Bucket of the current fare, -1 for removed rows
+
+        self.buckets = {}                       # bucket -> set of rows with a fare in it
+        self.bucket_keys = []                   # Sorted non-empty buckets
+        for flight in flights:
+            self.add_flight(flight)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _fare(self, row):
+        """ Fare of one row; the same arithmetic, in the same order, as the vectorized pass """
+        seats = self.seats[row] or 1.0
+        load = self.booked[row] / seats
+        until_departure = (self.departure[row] - self.now) % MINUTES_PER_DAY
+        multiplier = (1.0 + self.load_weight * (load * load)
+                      + self.waitlist_weight * min(self.waitlist[row] / seats, 1.0)
+                      + self.urgency_weight * max(1.0 - until_departure / self.urgency_window, 0.0))
+        return self.base[row] * multiplier
+
+    def _move(self, row, bucket):
+        """ Put a row in a fare bucket, leaving its old one """
+        old_bucket = self.fare_buckets[row]
+        if old_bucket == bucket:
+            return
+        if old_bucket >= 0:
+            members = self.buckets[old_bucket]
+            members.discard(row)
+            if not members:
+                del self.buckets[old_bucket]
+                del self.bucket_keys[bisect_left(self.bucket_keys, old_bucket)]
+        if bucket >= 0:
+            if bucket not in self.buckets:
+                self.buckets[bucket] = set()
+                insort(self.bucket_keys, bucket)
+            self.buckets[bucket].add(row)
+        self.fare_buckets[row] = bucket
+
+    def _reprice(self, row):
+        fare = self._fare(row)
+        self.fares[row] = fare
+        self._move(row, int(fare // self.bucket_size))
+
+    def add_flight(self, flight):
+        """ Start pricing a flight, or refresh it if it is already priced """
+        if flight.flight_no in self.rows:
+            self.update(flight)
+            return
+        row = len(self.flight_numbers)
+        self.rows[flight.flight_no] = row
+        self.flight_numbers.append(flight.flight_no)
+        self.base.append(flight.price)
+        self.seats.append(flight.seat_numbers)
+        self.booked.append(flight.booked_count())
+        self.waitlist.append(flight.waitlist_length())
+        self.departure.append(to_minutes(flight.departure_time))
+        self.fares.append(0.0)
+        self.fare_buckets.append(-1)
+        self._reprice(row)
+
+    def remove_flight(self, flight_no):
+        """ Stop pricing a flight; its row stays as a tombstone that bulk repricing skips """
+        row = self.rows.pop(flight_no, None)
+        if row is not None:
+            self._move(row, -1)
+            self.flight_numbers[row] = None
+
+    def update(self, flight):
+        """ Reprice one flight after a booking, cancellation, waitlist or cabin change, in O(1) """
+        row = self.rows.get(flight.flight_no)
+        if row is None:
+            self.add_flight(flight)
+            return
+        self.seats[row] = flight.seat_numbers
+        self.booked[row] = flight.booked_count()
+        self.waitlist[row] = flight.waitlist_length()
+        self._reprice(row)
+
+    def fare(self, flight_no):
+        """ Current fare of a flight, or None """
+        row = self.rows.get(flight_no)
+        return None if row is None else self.fares[row]
+
+    def advance_clock(self, now, vectorized=None):
+        """ Move the pricing clock to now ("HH:MM") and reprice every flight for the new times to departure """
+        self.now = to_minutes(now)
+        self.reprice_all(vectorized)
+
+    def reprice_all(self, vectorized=None):
+        """ Reprice the whole schedule, with NumPy when available (or when vectorized is True).
+        Only rows whose bucket changed touch the index. """
+        if vectorized is None:
+            vectorized = np is not None
+        if vectorized and np is None:
+            raise ImportError("NumPy is required for vectorized repricing.")
+        if not self.flight_numbers:
+            return
+
+        if not vectorized:
+            for row in self.rows.values():
+                self._reprice(row)
+            return
+
+        # Zero-copy views of the columns; fares are written back through the view
+        base, seats, booked, waitlist, departure, fares = (
+            np.frombuffer(column, dtype=np.float64)
+            for column in (self.base, self.seats, self.booked, self.waitlist, self.departure, self.fares))
+        old_buckets = np.frombuffer(self.fare_buckets, dtype=np.int64)
+
+        seats = np.where(seats == 0, 1.0, seats)
+        load = booked / seats
+        until_departure = np.mod(departure - self.now, MINUTES_PER_DAY)
+        multiplier = (1.0 + self.load_weight * (load * load)
+                      + self.waitlist_weight * np.minimum(waitlist / seats, 1.0)
+                      + self.urgency_weight * np.maximum(1.0 - until_departure / self.urgency_window, 0.0))
+        fares[:] = base * multiplier
+
+        new_buckets = np.floor_divide(fares, self.bucket_size).astype(np.int64)
+        new_buckets[old_buckets < 0] = -1                    # Removed rows stay out of the index
+        for row in np.nonzero(new_buckets != old_buckets)[0].tolist():
+            self._move(row, int(new_buckets[row]))
+
+    def _rows_between(self, low, high):
+        """ Rows of the buckets that can hold fares in [low, high], bucket by bucket in fare order """
+        first = bisect_left(self.bucket_keys, int(low // self.bucket_size))
+        for bucket in self.bucket_keys[first:]:
+            if bucket * self.bucket_size > high:
+                break
+            yield sorted(self.buckets[bucket], key=lambda row: (self.fares[row], row))
+
+    def flights_between(self, low, high):
+        """ (fare, flight_no) of the flights whose fare is in [low, high], cheapest first """
+        return [(self.fares[row], self.flight_numbers[row])
+                for rows in self._rows_between(low, high) for row in rows
+                if low <= self.fares[row] <= high]
+
+    def cheapest(self, limit=10):
+        """ (fare, flight_no) of the limit cheapest flights """
+        result = []
+        for rows in self._rows_between(0, float('inf')):
+            result.extend((self.fares[row], self.flight_numbers[row]) for row in rows[:limit - len(result)])
+            if len(result) >= limit:
+                break
+        return result
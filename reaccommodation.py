@@ -0,0 +1,126 @@
+""" Reaccommodation of passengers from cancelled or overbooked flights onto alternative flights """
+
+from bisect import bisect_left, insort
+
+from itinerary import to_minutes
+
+class ReaccommodationResult:
+    """ Where each displaced passenger ended up """
+    def __init__(self):
+        self.moved = []                         # (passenger, new flight, seat number)
+        self.waitlisted = []                    # (passenger, flight whose waitlist they joined)
+        self.stranded = []                      # Passengers with no alternative flight on their route
+        self.reseated = []                      # (passenger, seat number) moved forward on a shrunken flight
+
+    def __repr__(self):
+        return (f"ReaccommodationResult(moved {len(self.moved)}, waitlisted {len(self.waitlisted)}, "
+                f"stranded {len(self.stranded)})")
+
+class ReaccommodationEngine:
+    """ Index of flights by route and departure time that moves displaced passengers in priority order """
+    def __init__(self, flights=()):
+        self.routes = {}                        # (origin, destination) -> [(departure minutes, flight_no, flight)]
+        for flight in flights:
+            self.add_flight(flight)
+
+    @staticmethod
+    def _entry(flight):
+        return (to_minutes(flight.departure_time), str(flight.flight_no), flight)
+
+    def add_flight(self, flight):
+        """ Make a flight available as an alternative """
+        insort(self.routes.setdefault((flight.origin, flight.destination), []), self._entry(flight),
+               key=lambda entry: entry[:2])
+
+    def remove_flight(self, flight):
+        """ Stop offering a flight as an alternative """
+        departures = self.routes.get((flight.origin, flight.destination), [])
+        entry = self._entry(flight)
+        index = bisect_left(departures, entry[:2], key=lambda departure: departure[:2])
+        if index < len(departures) and departures[index][2] is flight:
+            del departures[index]
+
+    def alternatives(self, flight):
+        """ Other flights on the same route departing at or after this one, in departure order """
+        departures = self.routes.get((flight.origin, flight.destination), [])
+        first = bisect_left(departures, to_minutes(flight.departure_time), key=lambda departure: departure[0])
+        return [alternative for _, _, alternative in departures[first:] if alternative is not flight]
+
+    def cancel_flight(self, flight, skip=None):
+        """ Cancel a flight: rebook its passengers and then its waitlist onto alternatives, by priority.
+        Waitlisted passengers for whom skip(passenger) is true are dropped instead of rebooked. """
+        self.remove_flight(flight)
+
+        # Confirmed passengers keep precedence over the waitlist; within each group the higher priority goes first
+        confirmed = sorted(flight.passengers.values(), key=lambda passenger: -passenger.priority)
+        waitlisted = []
+        while not flight.waiting_list.is_empty():
+            passenger = flight.waiting_list.extract_max()
+            if skip is None or not skip(passenger):
+                waitlisted.append(passenger)
+
+        for passenger in confirmed:
+            flight.seat_linked_list.cancel_seat_booking(passenger.seat_number)
+        flight.passengers = {}
+
+        return self.reaccommodate(confirmed + waitlisted, self.alternatives(flight))
+
+    def resolve_overbooking(self, flight, seats_lost):
+        """ Shrink a flight by seats_lost seats at the back of the cabin. The lowest priority passengers (latest
+        bookings first on ties) who no longer fit are bumped onto alternatives, and passengers seated in the
+        removed rows move to the seats freed in front. """
+        seats_kept = max(flight.seat_numbers - seats_lost, 0)
+        passengers = list(flight.passengers.values())
+        order = sorted(range(len(passengers)), key=lambda index: (passengers[index].priority, -index))
+        bumped = [passengers[index] for index in order[:max(len(passengers) - seats_kept, 0)]]
+        for passenger in bumped:
+            flight.seat_linked_list.cancel_seat_booking(passenger.seat_number)
+            del flight.passengers[passenger.passenger_id]
+
+        reseated = []
+        for passenger in flight.passengers.values():
+            if passenger.seat_number > seats_kept:
+                seats = flight.seat_linked_list
+                seats.cancel_seat_booking(passenger.seat_number)
+                passenger.seat_number = seats.next_free_seat()
+                seats.book_seat(passenger.seat_number, passenger.passenger_id)
+                reseated.append((passenger, passenger.seat_number))
+        flight.remove_seats(seats_kept)
+
+        # Restore priority order for the rebooking
+        bumped.sort(key=lambda passenger: -passenger.priority)
+        result = self.reaccommodate(bumped, self.alternatives(flight))
+        result.reseated = reseated
+        return result
+
+    def reaccommodate(self, passengers, alternatives):
+        """ Seat passengers (already in priority order) on the alternatives in departure order, one bulk
+        booking per flight; anyone left over joins the first alternative's waitlist """
+        result = ReaccommodationResult()
+        if not alternatives:
+            result.stranded.extend(passengers)
+            return result
+
+        remaining = passengers
+        for alternative in alternatives:
+            if not remaining:
+                break
+            seats = alternative.get_seat_list()
+            free = seats.free_seats_in_zone(1, alternative.seat_numbers, len(remaining))
+            if not free:
+                continue
+
+            group, remaining = remaining[:len(free)], remaining[len(free):]
+            seats.book_seats(free, [passenger.passenger_id for passenger in group])
+            for passenger, seat_number in zip(group, free):
+                passenger.seat_number = seat_number
+                alternative.passengers[passenger.passenger_id] = passenger
+                result.moved.append((passenger, alternative, seat_number))
+
+        if remaining:
+            waitlist_flight = alternatives[0]
+            for passenger in remaining:
+                passenger.seat_number = None
+            waitlist_flight.waiting_list.bulk_load(remaining)
+            result.waitlisted.extend((passenger, waitlist_flight) for passenger in remaining)
+        return result
@@ -0,0 +1,184 @@
+""" Reservation backend sharded across worker processes by flight number, behind a single router """
+
+import multiprocessing
+import os
+import sys
+import zlib
+from heapq import merge
+
+from flight_reservation_system import FlightReservationSystem, flight_sort_key
+
+def shard_for(flight_number, shard_count):
+    """ Shard owning a flight: crc32 of the flight number, stable across processes and runs unlike hash() """
+    return zlib.crc32(str(flight_number).encode()) % shard_count
+
+# Operations a shard runs against its own FlightReservationSystem; results must be picklable
+
+def _add_flight(system, flight_number, departure_time, origin, destination, price, seats):
+    return system.add_flight(flight_number, departure_time, origin, destination, price, seats) is not None
+
+def _change_aircraft(system, flight_number, seat_numbers):
+    return [passenger.passenger_id for passenger in system.change_aircraft(flight_number, seat_numbers)]
+
+def _cancel_reservation(system, flight_number, passenger_id):
+    """ Cancel routed by flight number, so every flight operation takes the flight number first """
+    return system.cancel_reservation(passenger_id)
+
+def _list_flights(system):
+    return [(flight.flight_no, flight.origin, flight.destination, flight.departure_time)
+            for _, flight in system.flights.items(system.flights.root)]
+
+def _find_passenger(system, passenger_id):
+    return system.passenger_info.get(passenger_id)
+
+SHARD_OPERATIONS = {
+    "add_flight": _add_flight,
+    "book": FlightReservationSystem.book,
+    "join_waitlist": FlightReservationSystem.join_waitlist,
+    "cancel_reservation": _cancel_reservation,
+    "cancel_anywhere": FlightReservationSystem.cancel_reservation,
+    "change_aircraft": _change_aircraft,
+    "list_flights": _list_flights,
+    "find_passenger": _find_passenger,
+}
+
+class ShardError:
+    """ Exception raised by one operation in a shard, sent back in place of its result """
+    def __init__(self, exception):
+        self.exception = exception
+
+def _run_operation(system, operation, arguments):
+    try:
+        return SHARD_OPERATIONS[operation](system, *arguments)
+    except Exception as exception:
+        # The shard keeps serving; the router re-raises the exception to the caller
+        return ShardError(exception)
+
+def _unwrap(result):
+    """ The result of a shard operation, re-raising the exception it failed with """
+    if isinstance(result, ShardError):
+        raise result.exception
+    return result
+
+def _shard_worker(connection):
+    """ Shard process: run batches of (operation, arguments) until the router sends None """
+    sys.stdout = open(os.devnull, "w")      # The system reports refusals with print; the router returns results
+    system = FlightReservationSystem()
+    while True:
+        batch = connection.recv()
+        if batch is None:
+            break
+        connection.send([_run_operation(system, operation, arguments) for operation, arguments in batch])
+    connection.close()
+
+class ShardedReservationSystem:
+    """ Router over shard processes that each own the flights hashing to them, with their bookings and waitlists.
+    Flight operations go to the owning shard; listing flights and passenger lookups scatter to every shard.
+    A passenger's one-reservation rule is enforced per shard, and reaccommodation stays within one shard. """
+    def __init__(self, shard_count=None):
+        self.shard_count = shard_count or os.cpu_count() or 1
+        self.connections = []
+        self.processes = []
+        for _ in range(self.shard_count):
+            router_end, shard_end = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_shard_worker, args=(shard_end,), daemon=True)
+            process.start()
+            shard_end.close()
+            self.connections.append(router_end)
+            self.processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _call(self, shard, operation, *arguments):
+        self.connections[shard].send([(operation, arguments)])
+        return _unwrap(self.connections[shard].recv()[0])
+
+    def _scatter(self, operation, *arguments):
+        """ Run an operation on every shard in parallel and return their results in shard order """
+        for connection in self.connections:
+            connection.send([(operation, arguments)])
+        # Every shard's reply is read before raising, so no reply is left queued for the next call
+        results = [connection.recv()[0] for connection in self.connections]
+        return [_unwrap(result) for result in results]
+
+    def shard_of(self, flight_number):
+        return shard_for(flight_number, self.shard_count)
+
+    def add_flight(self, flight_number, departure_time, origin, destination, price, seats):
+        """ Create a flight on its shard; returns False if it already exists """
+        return self._call(self.shard_of(flight_number), "add_flight",
+                          flight_number, departure_time, origin, destination, price, seats)
+
+    def book(self, flight_number, passenger_id, seat=None, name=None, business_class=False):
+        """ Book a seat (the first free one if seat is None); returns the seat number or None """
+        return self._call(self.shard_of(flight_number), "book", flight_number, passenger_id, seat, name,
+                          business_class)
+
+    def join_waitlist(self, flight_number, passenger_id, name=None, business_class=False):
+        return self._call(self.shard_of(flight_number), "join_waitlist", flight_number, passenger_id, name,
+                          business_class)
+
+    def change_aircraft(self, flight_number, seat_numbers):
+        """ Grow a flight's cabin; returns the ids of the waitlisted passengers promoted into the new seats """
+        return self._call(self.shard_of(flight_number), "change_aircraft", flight_number, seat_numbers)
+
+    def cancel_reservation(self, passenger_id, flight_number=None):
+        """ Cancel a reservation and promote the flight's waitlist. Without the flight number every shard is asked. """
+        if flight_number is not None:
+            return self._call(self.shard_of(flight_number), "cancel_reservation", flight_number, passenger_id)
+        return any(self._scatter("cancel_anywhere", passenger_id))
+
+    def find_passenger(self, passenger_id):
+        """ The BookingDetail of a passenger's reservation on any shard, or None """
+        for detail in self._scatter("find_passenger", passenger_id):
+            if detail is not None:
+                return detail
+        return None
+
+    def list_flights(self):
+        """ (flight_no, origin, destination, departure_time) of every flight, in flight number order """
+        return list(merge(*self._scatter("list_flights"), key=lambda flight: flight_sort_key(flight[0])))
+
+    def display_flights(self):
+        """ Print every flight in flight number order """
+        print("Available flights (sorted by flight number):")
+        for flight_no, origin, destination, departure_time in self.list_flights():
+            print(f"Flight {flight_no}: {origin} -> {destination} at {departure_time}")
+
+    def execute(self, operations):
+        """ Run many (operation, arguments) pairs whose first argument is the flight number, e.g.
+        ("book", (flight_number, passenger_id)) or ("cancel_reservation", (flight_number, passenger_id)),
+        with one message per shard so the shards work in parallel.
+        Operations on the same flight keep their order; results come back in the order given.
+        If an operation raised in its shard, the first such exception is raised once every shard has answered. """
+        batches = [[] for _ in range(self.shard_count)]
+        owners = []
+        for operation, arguments in operations:
+            shard = self.shard_of(arguments[0])
+            owners.append((shard, len(batches[shard])))
+            batches[shard].append((operation, arguments))
+
+        busy = [shard for shard in range(self.shard_count) if batches[shard]]
+        for shard in busy:
+            self.connections[shard].send(batches[shard])
+        results = [None] * self.shard_count
+        for shard in busy:
+            results[shard] = self.connections[shard].recv()
+        return [_unwrap(results[shard][index]) for shard, index in owners]
+
+    def close(self):
+        """ Stop the shard processes """
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
@@ -0,0 +1,91 @@
+""" Adjacent-seat search and all-or-nothing group booking, checked against a linear scan """
+
+import contextlib
+import io
+import random
+import unittest
+
+from flight_seats import FreeRunIndex, FlightSeatsList, CompactFlightSeats
+
+def first_run(free_flags, length):
+    """ Start of the leftmost run of length free positions, or -1, by scanning every position """
+    run = 0
+    for position, free in enumerate(free_flags):
+        run = run + 1 if free else 0
+        if length > 0 and run == length:
+            return position - length + 1
+    return -1
+
+class FreeRunIndexTest(unittest.TestCase):
+    def test_find_run_matches_linear_scan(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            flags = [rng.random() < 0.6 for _ in range(rng.randint(0, 40))]
+            index = FreeRunIndex(flags)
+            for _ in range(30):
+                operation = rng.random()
+                if operation < 0.5 and flags:
+                    position = rng.randrange(len(flags))
+                    flags[position] = not flags[position]
+                    index.set_free(position, flags[position])
+                elif operation < 0.8:
+                    flags.append(rng.random() < 0.6)
+                    index.append(flags[-1])
+                elif flags:
+                    flags.pop()
+                    index.pop()
+                for length in range(0, len(flags) + 2):
+                    self.assertEqual(index.find_run(length), first_run(flags, length))
+
+class AdjacentSeatsTest(unittest.TestCase):
+    def check_seat_map(self, seats, size, seed):
+        rng = random.Random(seed)
+        booked = set()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for passenger_id in range(300):
+                if booked and rng.random() < 0.3:
+                    seat_number = rng.choice(sorted(booked))
+                    self.assertTrue(seats.cancel_seat_booking(seat_number))
+                    booked.discard(seat_number)
+                    continue
+
+                count = rng.randint(1, 4)
+                start = first_run([seat not in booked for seat in range(1, size + 1)], count)
+                result = seats.book_adjacent_seats(count, passenger_id)
+                if start == -1:
+                    self.assertIsNone(result)
+                else:
+                    self.assertEqual(result, list(range(start + 1, start + count + 1)))
+                    booked.update(result)
+                self.assertEqual(seats.available_count, size - len(booked))
+
+    def test_linked_list_matches_linear_scan(self):
+        self.check_seat_map(FlightSeatsList(30), 30, 1)
+
+    def test_compact_matches_linear_scan(self):
+        self.check_seat_map(CompactFlightSeats(30), 30, 2)
+
+class GroupBookingTest(unittest.TestCase):
+    def test_conflict_books_nothing(self):
+        for seats in (FlightSeatsList(5), CompactFlightSeats(5)):
+            seats.book_seat(3, 100)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertFalse(seats.book_seats([1, 2, 3], [1, 2, 3]))
+                self.assertFalse(seats.book_seats([4, 9], [4, 9]))
+                self.assertFalse(seats.book_seats([4, 4], [4, 5]))
+            self.assertEqual([seats.is_booked(seat) for seat in range(1, 6)], [False, False, True, False, False])
+            self.assertEqual(seats.available_count, 4)
+
+    def test_failure_midway_rolls_back(self):
+        # The compact map refuses a non-integer id only when that seat is reached, after earlier seats are booked
+        seats = CompactFlightSeats(5)
+        seats.find_adjacent_seats(1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(ValueError):
+                seats.book_seats([1, 2, 3], [1, "two", 3])
+        self.assertFalse(any(seats.is_booked(seat) for seat in range(1, 6)))
+        self.assertEqual(seats.available_count, 5)
+        self.assertEqual(seats.find_adjacent_seats(5), [1, 2, 3, 4, 5])
+
+if __name__ == "__main__":
+    unittest.main()
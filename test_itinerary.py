@@ -0,0 +1,66 @@
+""" Connection scan itinerary queries, checked against enumerating every itinerary """
+
+import random
+import unittest
+
+from flights import Flight
+from itinerary import ConnectionScanPlanner, MINUTES_PER_DAY, to_clock, to_minutes
+
+CITIES = ["A", "B", "C", "D", "E"]
+
+def random_schedule(rng, count):
+    flights = []
+    for number in range(count):
+        origin, destination = rng.sample(CITIES, 2)
+        departure = rng.randrange(0, 20 * 60, 5)
+        flights.append(Flight(f"F{number}", to_clock(departure), origin, destination, rng.randint(50, 500),
+                              arrival_time=to_clock((departure + rng.randint(30, 300)) % MINUTES_PER_DAY)))
+    return flights
+
+def itineraries(planner, origin, destination, depart_after, max_legs, layover):
+    """ (arrival, fare) of every itinerary of at most max_legs flights, by depth-first enumeration """
+    results = []
+    stack = [(connection,) for connection in planner.connections
+             if connection[2] == origin and connection[0] >= to_minutes(depart_after)]
+    while stack:
+        legs = stack.pop()
+        if legs[-1][3] == destination:
+            results.append((legs[-1][1], sum(connection[4] for connection in legs)))
+            continue
+        if len(legs) < max_legs:
+            stack.extend(legs + (connection,) for connection in planner.connections
+                         if connection[2] == legs[-1][3] and connection[0] >= legs[-1][1] + layover)
+    return results
+
+class ConnectionScanTest(unittest.TestCase):
+    def check_itinerary(self, itinerary, origin, destination, depart_after, max_legs, layover):
+        self.assertLessEqual(len(itinerary.legs), max_legs)
+        self.assertEqual((itinerary.legs[0].origin, itinerary.legs[-1].destination), (origin, destination))
+        self.assertGreaterEqual(itinerary.departure, to_minutes(depart_after))
+        for flight, next_flight in zip(itinerary.legs, itinerary.legs[1:]):
+            self.assertEqual(flight.destination, next_flight.origin)
+
+    def test_matches_enumeration(self):
+        rng = random.Random(3)
+        for _ in range(80):
+            planner = ConnectionScanPlanner(random_schedule(rng, 25), min_layover=rng.choice([0, 30, 60]),
+                                            max_connections=rng.randint(0, 2))
+            origin, destination = rng.sample(CITIES, 2)
+            depart_after = to_clock(rng.randrange(0, 12 * 60, 15))
+            max_legs, layover = planner.max_connections + 1, planner.min_layover
+            options = itineraries(planner, origin, destination, depart_after, max_legs, layover)
+
+            earliest = planner.earliest_arrival(origin, destination, depart_after)
+            cheapest = planner.cheapest(origin, destination, depart_after)
+            if not options:
+                self.assertIsNone(earliest)
+                self.assertIsNone(cheapest)
+                continue
+
+            self.assertEqual(earliest.arrival, min(arrival for arrival, _ in options))
+            self.assertEqual(cheapest.price, min(fare for _, fare in options))
+            for itinerary in (earliest, cheapest):
+                self.check_itinerary(itinerary, origin, destination, depart_after, max_legs, layover)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+""" Route searches on small random graphs, checked against exhaustive path enumeration """
+
+import contextlib
+import io
+import random
+import unittest
+
+from map import Graph, RouteCache
+
+def random_graph(rng, cities, edges):
+    graph = Graph()
+    for city in range(cities):
+        graph.add_node(f"C{city}")
+    for _ in range(edges):
+        city1, city2 = rng.sample(range(cities), 2)
+        graph.add_edge(f"C{city1}", f"C{city2}", rng.randint(1, 20))
+    return graph
+
+def simple_paths(graph, start_node, end_node):
+    """ Every loopless path from start_node to end_node with its distance, by depth-first search """
+    paths = []
+    stack = [(start_node, [start_node], 0)]
+    while stack:
+        node, path, distance = stack.pop()
+        if node == end_node:
+            paths.append((path, distance))
+            continue
+        for neighbor in graph.adjacency_list[node]:
+            if neighbor not in path:
+                stack.append((neighbor, path + [neighbor], distance + graph.weights[(node, neighbor)]))
+    return paths
+
+def path_distance(graph, path):
+    return sum(graph.weights[(node, next_node)] for node, next_node in zip(path, path[1:]))
+
+class KShortestPathsTest(unittest.TestCase):
+    def test_yen_matches_enumeration(self):
+        rng = random.Random(5)
+        for _ in range(60):
+            graph = random_graph(rng, 7, 12)
+            start_node, end_node = rng.sample(sorted(graph.adjacency_list), 2)
+            k = rng.randint(1, 8)
+            expected = sorted(distance for _, distance in simple_paths(graph, start_node, end_node))[:k]
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                routes = graph.k_shortest_paths(start_node, end_node, k)
+            self.assertEqual([distance for _, distance in routes], expected)
+
+            paths = [tuple(path) for path, _ in routes]
+            self.assertEqual(len(set(paths)), len(paths))
+            for path, distance in routes:
+                self.assertEqual((path[0], path[-1]), (start_node, end_node))
+                self.assertEqual(len(set(path)), len(path))
+                self.assertEqual(path_distance(graph, path), distance)
+
+    def test_no_route(self):
+        graph = Graph()
+        for city in ("A", "B", "C"):
+            graph.add_node(city)
+        graph.add_edge("A", "B", 1)
+        self.assertEqual(graph.k_shortest_paths("A", "C", 3), [])
+        self.assertEqual(graph.k_shortest_paths("A", "B", 0), [])
+
+class ShortestPathTest(unittest.TestCase):
+    def test_strategies_match_enumeration(self):
+        rng = random.Random(9)
+        for _ in range(40):
+            graph = random_graph(rng, 7, 10)
+            start_node, end_node = rng.sample(sorted(graph.adjacency_list), 2)
+            paths = simple_paths(graph, start_node, end_node)
+            for strategy in ("dijkstra", "bidirectional", "astar"):
+                graph.shortest_path_cache = RouteCache(8)       # Each strategy searches instead of hitting the cache
+                route = graph.shortest_path(start_node, end_node, strategy)
+                if not paths:
+                    self.assertIsNone(route)
+                else:
+                    self.assertEqual(route[1], min(distance for _, distance in paths))
+                    self.assertEqual(path_distance(graph, route[0]), route[1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+""" Crash recovery tests for the write-ahead log """
+
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from persistence import PersistentReservationSystem, WriteAheadLog
+
+class TornLogRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def open_store(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return PersistentReservationSystem(self.directory)
+
+    def test_reopen_after_torn_tail(self):
+        store = self.open_store()
+        with contextlib.redirect_stdout(io.StringIO()):
+            store.add_flight("AA1", "08:00", "JFK", "LAX", 300, 20)
+            for passenger_id in range(5):
+                store.book("AA1", passenger_id)
+        store.close()
+
+        # Simulate a crash in the middle of writing the last record
+        log_path = store.log_path(store.generation)
+        with open(log_path, "r+b") as log_file:
+            log_file.truncate(os.path.getsize(log_path) - 3)
+
+        store = self.open_store()
+        self.assertEqual(len(store.system.passenger_info), 4)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for passenger_id in range(5, 10):
+                store.book("AA1", passenger_id)
+        store.close()
+
+        store = self.open_store()
+        self.assertEqual(sorted(store.system.passenger_info), [0, 1, 2, 3, 5, 6, 7, 8, 9])
+        store.close()
+
+    def test_replay_reports_intact_length(self):
+        path = os.path.join(self.directory, "wal.0")
+        log = WriteAheadLog(path)
+        log.append(("cancel", 1))
+        log.append(("cancel", 2))
+        log.close()
+        intact_size = os.path.getsize(path)
+        with open(path, "ab") as log_file:
+            log_file.write(b"\x10\x00")
+
+        records, intact_length = WriteAheadLog.replay(path)
+        self.assertEqual(records, [("cancel", 1), ("cancel", 2)])
+        self.assertEqual(intact_length, intact_size)
+
+class CrashAfterIdleTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_process_crash_keeps_logged_events(self):
+        # Book, go idle, then die without closing the log
+        script = (
+            "import os, sys, time\n"
+            "from persistence import PersistentReservationSystem\n"
+            "sys.stdout = open(os.devnull, 'w')\n"
+            "store = PersistentReservationSystem(sys.argv[1])\n"
+            "store.add_flight('AA1', '08:00', 'JFK', 'LAX', 300, 30)\n"
+            "for passenger_id in range(20):\n"
+            "    store.book('AA1', passenger_id)\n"
+            "time.sleep(0.2)\n"
+            "os._exit(0)\n")
+        subprocess.run([sys.executable, "-c", script, self.directory], check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            store = PersistentReservationSystem(self.directory)
+        self.assertIsNotNone(store.system.find_flight("AA1"))
+        self.assertEqual(sorted(store.system.passenger_info), list(range(20)))
+        store.close()
+
+    def test_idle_batch_is_synced(self):
+        log = WriteAheadLog(os.path.join(self.directory, "wal.0"), batch_size=1000, sync_interval=0.01)
+        self.addCleanup(log.close)
+        log.append(("cancel", 1))
+        deadline = time.monotonic() + 5
+        while log.pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(log.pending, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+""" Indexed waitlist heap, checked against a sorted reference """
+
+import contextlib
+import io
+import random
+import unittest
+
+from flights import Passenger
+from waitlist import MaxHeapPriorityQueue
+
+class WaitlistOrderTest(unittest.TestCase):
+    def test_extract_order_matches_sorted_reference(self):
+        rng = random.Random(11)
+        queue = MaxHeapPriorityQueue()
+        reference = {}                      # passenger_id -> (-priority, arrival), smallest served first
+        arrival = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for passenger_id in range(5000):
+                operation = rng.random()
+                if not reference or operation < 0.45:
+                    priority = rng.randint(1, 3)
+                    self.assertTrue(queue.insert(Passenger(None, passenger_id, priority)))
+                    reference[passenger_id] = (-priority, arrival)
+                    arrival += 1
+                elif operation < 0.75:
+                    expected = min(reference, key=reference.get)
+                    self.assertEqual(queue.extract_max().passenger_id, expected)
+                    del reference[expected]
+                elif operation < 0.9:
+                    updated = rng.choice(list(reference))
+                    priority = rng.randint(1, 3)
+                    self.assertTrue(queue.update_priority(updated, priority))
+                    reference[updated] = (-priority, reference[updated][1])
+                else:
+                    removed = rng.choice(list(reference))
+                    self.assertEqual(queue.remove(removed).passenger_id, removed)
+                    del reference[removed]
+                self.assertEqual(len(queue), len(reference))
+
+        # Drain what is left
+        remaining = sorted(reference, key=reference.get)
+        self.assertEqual([queue.extract_max().passenger_id for _ in remaining], remaining)
+        self.assertTrue(queue.is_empty())
+
+    def test_bulk_load_keeps_arrival_order_within_priority(self):
+        queue = MaxHeapPriorityQueue()
+        queue.insert(Passenger(None, 0, 1))
+        queue.bulk_load([Passenger(None, passenger_id, passenger_id % 2 + 1) for passenger_id in range(1, 9)])
+        order = [queue.extract_max().passenger_id for _ in range(9)]
+        self.assertEqual(order, [1, 3, 5, 7, 0, 2, 4, 6, 8])
+
+    def test_duplicates_are_refused(self):
+        queue = MaxHeapPriorityQueue()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(queue.insert(Passenger(None, 1, 1)))
+            self.assertFalse(queue.insert(Passenger(None, 1, 2)))
+            self.assertFalse(queue.update_priority(2, 1))
+        self.assertIsNone(queue.remove(2))
+        self.assertEqual(len(queue), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,70 +1,145 @@
 """ Priority Queue to maintain the waitlist on the flight based on the highest priority """
 
+import metrics
+
 # from flights import Passenger
 
 class MaxHeapPriorityQueue:
-    """ Maximum heap priority queue which will store highest priority passenger first """
+    """ Maximum heap priority queue which will store highest priority passenger first.
+    Equal priorities are served first come first served, and passengers are indexed by passenger_id
+    so they can be re-prioritised or removed in O(log n). """
     def __init__(self):
-        self.heap = []
+        self.heap = []                              # [(-priority, sequence), passenger] entries, smallest key first
+        self.positions = {}                         # passenger_id -> index of its entry in the heap
+        self.sequence = 0                           # Arrival counter used to break priority ties
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, passenger_id):
+        return passenger_id in self.positions
 
     def shift_up(self, index):
         """ Function to restore max heap property """
-        parent_index = (index - 1) // 2
+        heap, positions = self.heap, self.positions
+        entry = heap[index]
+        key = entry[0]
 
-        # Make sure that the highest priority is at the root
-        if index > 0 and self.heap[index].priority > self.heap[parent_index].priority:
-            # Swap with parent if current node's priority is higher
-            self.heap[index], self.heap[parent_index] = self.heap[parent_index], self.heap[index]
-            self.shift_up(parent_index)
+        # Move parents with a lower priority (or a later arrival) down until the entry's place is found
+        while index > 0:
+            parent_index = (index - 1) // 2
+            parent = heap[parent_index]
+            if not key < parent[0]:
+                break
+            heap[index] = parent
+            positions[parent[1].passenger_id] = index
+            index = parent_index
+
+        heap[index] = entry
+        positions[entry[1].passenger_id] = index
+
+    def shift_down(self, index):
+        """ Function to shift down the passenger based on the priority """
+        heap, positions = self.heap, self.positions
+        heap_size = len(heap)
+        entry = heap[index]
+        key = entry[0]
+
+        while True:
+            child = 2 * index + 1                   # Left child index with parent index
+            if child >= heap_size:
+                break
+            # Pick the child served first
+            if child + 1 < heap_size and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if not heap[child][0] < key:
+                break
+            heap[index] = heap[child]
+            positions[heap[index][1].passenger_id] = index
+            index = child
+
+        heap[index] = entry
+        positions[entry[1].passenger_id] = index
+
+    def new_entry(self, passenger):
+        """ Heap entry for a passenger, stamped with the next arrival number """
+        entry = [(-passenger.priority, self.sequence), passenger]
+        self.sequence += 1
+        return entry
 
     def insert(self, passenger):
         """ Insert passenger into the waitlist """
-        self.heap.append(passenger)
+        if passenger.passenger_id in self.positions:
+            print(f"Passenger {passenger.passenger_id} is already on the waitlist.")
+            return False
+        self.heap.append(self.new_entry(passenger))
+        self.positions[passenger.passenger_id] = len(self.heap) - 1
         self.shift_up(len(self.heap) - 1)
+        if metrics.enabled:
+            metrics.WAITLISTED_PASSENGERS.inc()
+        return True
+
+    def bulk_load(self, passengers):
+        """ Add many passengers in arrival order and restore the heap bottom up in O(n) """
+        size_before = len(self.heap)
+        for passenger in passengers:
+            if passenger.passenger_id not in self.positions:
+                self.heap.append(self.new_entry(passenger))
+                self.positions[passenger.passenger_id] = len(self.heap) - 1
+        for index in range(len(self.heap) // 2 - 1, -1, -1):
+            self.shift_down(index)
+        if metrics.enabled:
+            metrics.WAITLISTED_PASSENGERS.inc(len(self.heap) - size_before)
 
     def heap_maximum_element(self):
         """ Return the maximum element from the heap """
         if self.is_empty():
             raise IndexError("Maximum Heap Priority queue is empty.")
-        return self.heap[0]
+        return self.heap[0][1]
 
-    def shift_down(self, index):
-        """ Function to shift down the passenger based on the priority """
-        heap_size = len(self.heap)
-        left = 2 * index + 1                        # Left child index with parent index
-        right = 2 * index + 2                       # Right child index with parent index
-
-        # Check to see if the left child of root exists and if it does,
-        # check to see if the priority is larger than the root.
-        # Set the largest to the larger value index between left child and root
-        if (left < heap_size) and (self.heap[left].priority > self.heap[index].priority):
-            largest = left
-        else:
-            largest = index
-
-        # Check to see if the right child of root exists and if it does,
-        # check to see if the value is larger than the root.
-        # Set the largest to the right child index in order to swap
-        if (right < heap_size) and (self.heap[right].priority > self.heap[largest].priority):
-            largest = right
-
-        # If the largest is either left or right child, swap it with the root
-        if largest is not index:
-            self.heap[index], self.heap[largest] = self.heap[largest], self.heap[index]
-
-            # Recursively heapify the affected subtree
-            self.shift_down(largest)
+    def remove_at(self, index):
+        """ Remove the entry at index and return its passenger """
+        entry = self.heap[index]
+        last = self.heap.pop()                      # Remove the last passenger
+        del self.positions[entry[1].passenger_id]
+        if metrics.enabled:
+            metrics.WAITLISTED_PASSENGERS.dec()
+        if index < len(self.heap):
+            # Move the last entry into the hole and restore the heap around it
+            self.heap[index] = last
+            self.shift_up(index)
+            self.shift_down(self.positions[last[1].passenger_id])
+        return entry[1]
 
     def extract_max(self):
         """ Function to get the passenger with the highest priority from the list """
-        max_value = self.heap_maximum_element()         # Get the maximum priority passenger from the heap
-        self.heap[0] = self.heap[-1]
-        self.heap.pop()                                 # Remove the last passenger
-        self.shift_down(0)                              # Get the highest priority passenger to top again
+        self.heap_maximum_element()                 # Raises if the waitlist is empty
+        return self.remove_at(0)
+
+    def remove(self, passenger_id):
+        """ Take a passenger off the waitlist (e.g. they gave up) and return them, or None """
+        index = self.positions.get(passenger_id)
+        if index is None:
+            return None
+        return self.remove_at(index)
 
-        return max_value
+    def update_priority(self, passenger_id, priority):
+        """ Change a waitlisted passenger's priority, keeping their place among equal priorities """
+        index = self.positions.get(passenger_id)
+        if index is None:
+            print(f"Passenger {passenger_id} is not on the waitlist.")
+            return False
+
+        entry = self.heap[index]
+        old_priority = -entry[0][0]
+        entry[0] = (-priority, entry[0][1])
+        entry[1].priority = priority
+        if priority > old_priority:
+            self.shift_up(index)
+        else:
+            self.shift_down(index)
+        return True
 
     def is_empty(self):
         """ Return if the waitlist is empty or not """
         return len(self.heap) == 0
-